@@ -0,0 +1,149 @@
+"""Requests per instance: the sync Flask app against the asyncio serving mode.
+
+    python benchmarks/async_vs_sync.py --latency-ms 100 --concurrency 16 64 256
+
+Each mode is served the way it would run in production, by one process: the
+Flask app under gunicorn with a fixed thread pool (as functions-framework
+runs it, `--threads` defaulting to 4 per CPU), and `async_app.app` under a
+single uvicorn worker. Both point at the same fake MuralPay with a fixed
+latency. The response cache is disabled and requests are spread over many
+organizations, so every request costs a real upstream round trip instead of
+being answered by the cache or coalesced.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+import requests
+
+from fake_muralpay import FakeConfig
+from harness import FakeMuralPay, Scenario, format_table, free_port, load_main, run_scenario
+
+COLUMNS = ['mode', 'scenario', 'concurrency', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms',
+           'upstream_calls_per_request', 'statuses']
+
+BENCH_ENV = {
+    # Measure queuing inside the instance, not load shedding or cache hits.
+    'MAX_CONCURRENT_REQUESTS': '100000',
+    'ASYNC_MAX_CONCURRENT_REQUESTS': '100000',
+    'RESPONSE_CACHE_MAX_BYTES': '0',
+}
+
+
+def serve_sync(api_url, port, threads, ready):
+    import gunicorn.app.base
+
+    main = load_main(api_url, env={**BENCH_ENV, 'UPSTREAM_POOL_MAXSIZE': str(threads)})
+
+    class Application(gunicorn.app.base.BaseApplication):
+        def load_config(self):
+            for key, value in {'bind': f'127.0.0.1:{port}', 'workers': 1, 'threads': threads,
+                               'loglevel': 'error', 'timeout': 0}.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return main.app
+
+    ready.set()
+    Application().run()
+
+
+def serve_async(api_url, port, max_connections, ready):
+    import uvicorn
+
+    load_main(api_url, env={**BENCH_ENV, 'ASYNC_UPSTREAM_MAX_CONNECTIONS': str(max_connections)})
+    import async_app
+
+    ready.set()
+    uvicorn.run(async_app.app, host='127.0.0.1', port=port, log_level='error')
+
+
+class ModeServer:
+    """Runs one serving mode in a child process."""
+
+    def __init__(self, target, api_url, size):
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self._target = target
+        self._args = (api_url, self.port, size)
+
+    def __enter__(self):
+        ctx = multiprocessing.get_context('spawn')
+        ready = ctx.Event()
+        self._process = ctx.Process(target=self._target, args=(*self._args, ready), daemon=True)
+        self._process.start()
+        if not ready.wait(60):
+            raise RuntimeError('Server did not start')
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                requests.options(self.url + '/api/organizations', timeout=1)
+                return self
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        raise RuntimeError('Server did not accept connections')
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join(10)
+
+
+def scenarios(orgs, accounts_per_org):
+    org_ids = [f'org-{i:04d}' for i in range(orgs)]
+    return [
+        Scenario('accounts', 'GET', None, paths=[f'/api/accounts/{org_id}' for org_id in org_ids]),
+        Scenario('account', 'GET', None,
+                 paths=[f'/api/accounts/{org_id}/{org_id}-acc-{i % accounts_per_org}'
+                        for i, org_id in enumerate(org_ids)]),
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--requests', type=int, default=1000, help='requests per run')
+    parser.add_argument('--latency-ms', type=float, default=100.0, help='fixed fake MuralPay latency')
+    parser.add_argument('--threads', type=int, default=(os.cpu_count() or 1) * 4,
+                        help='gunicorn threads for the sync mode')
+    parser.add_argument('--max-connections', type=int, default=100,
+                        help='upstream connection limit for the async mode')
+    parser.add_argument('--orgs', type=int, default=500)
+    parser.add_argument('--accounts-per-org', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = FakeConfig(orgs=args.orgs, accounts_per_org=args.accounts_per_org,
+                        payouts_per_org=0, latency_ms=args.latency_ms, jitter_ms=0.0)
+    modes = [
+        (f'sync ({args.threads} threads)', serve_sync, args.threads),
+        ('async', serve_async, args.max_connections),
+    ]
+
+    results = []
+    with FakeMuralPay(config) as fake:
+        for mode, target, size in modes:
+            with ModeServer(target, fake.api_url, size) as server:
+                # Warm the secret cache and connection pool before measuring.
+                requests.get(server.url + '/api/accounts/org-0000', timeout=30)
+                for scenario in scenarios(args.orgs, args.accounts_per_org):
+                    if args.only and scenario.name not in args.only:
+                        continue
+                    for concurrency in args.concurrency:
+                        result = run_scenario(server.url, scenario, concurrency, args.requests, fake)
+                        results.append({'mode': mode, **result})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_table(results, COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Local stand-in for the MuralPay staging API.
+
+Serves the subset of endpoints that functions/main.py calls, backed by a
+generated data set, with configurable latency and error injection. Call
+counts per endpoint are available from GET /__stats so the benchmark can
+report upstream calls per request. With `rate_limit_rps` set, calls beyond
+that many per one-second window get a 429, and every response carries
+X-RateLimit-Limit/Remaining/Reset headers.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+
+@dataclass
+class FakeConfig:
+    orgs: int = 20
+    accounts_per_org: int = 3
+    payouts_per_org: int = 200
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    rate_limit_rps: int = 0
+    seed: int = 7
+
+
+def build_dataset(config):
+    rng = random.Random(config.seed)
+    tos_statuses = ['ACCEPTED', 'NOT_ACCEPTED', 'NEEDS_REVIEW']
+    kyc_types = ['approved', 'INACTIVE', 'pending']
+    payout_statuses = ['AWAITING_EXECUTION', 'PENDING', 'EXECUTED', 'FAILED', 'CANCELED']
+
+    orgs, accounts, payouts = [], {}, {}
+    for i in range(config.orgs):
+        org_id = f'org-{i:04d}'
+        updated = f'2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}T00:00:00Z'
+        orgs.append({
+            'id': org_id,
+            'name': f'Organization {i}',
+            'type': 'business',
+            'createdAt': '2024-01-01T00:00:00Z',
+            'updatedAt': updated,
+            'tosStatus': tos_statuses[i % len(tos_statuses)],
+            'kycStatus': {'type': kyc_types[i % len(kyc_types)]},
+            'currencyCapabilities': [],
+        })
+        accounts[org_id] = [{
+            'id': f'{org_id}-acc-{j}',
+            'name': f'Account {j}',
+            'status': 'ACTIVE',
+            'isApiEnabled': True,
+            'createdAt': '2024-01-01T00:00:00Z',
+            'updatedAt': updated,
+            'accountDetails': {
+                'balances': [{'tokenAmount': round(rng.uniform(0, 10000), 2),
+                              'tokenSymbol': 'USDC'}],
+                'walletDetails': {'blockchain': 'POLYGON',
+                                  'walletAddress': f'0x{rng.getrandbits(160):040x}'},
+            },
+        } for j in range(config.accounts_per_org)]
+        payouts[org_id] = [{
+            'id': f'{org_id}-payout-{k:05d}',
+            'status': payout_statuses[k % len(payout_statuses)],
+            'memo': f'Invoice {k}',
+            'sourceAccountId': f'{org_id}-acc-{k % max(config.accounts_per_org, 1)}',
+            'createdAt': f'2024-{(k % 12) + 1:02d}-{(k % 28) + 1:02d}T00:00:00Z',
+            'updatedAt': f'2024-{(k % 12) + 1:02d}-{(k % 28) + 1:02d}T00:00:00Z',
+            'payouts': [{
+                'id': f'{org_id}-payout-{k:05d}-0',
+                'amount': {'tokenAmount': round(rng.uniform(1, 5000), 2), 'tokenSymbol': 'USDC'},
+                'details': {'type': 'fiat', 'fiatAndRailCode': 'cop',
+                            'fiatPayoutStatus': {'type': 'created'}},
+            }],
+        } for k in range(config.payouts_per_org)]
+    return orgs, accounts, payouts
+
+
+def create_app(config):
+    app = Flask('fake_muralpay')
+    orgs, accounts, payouts = build_dataset(config)
+    orgs_by_id = {org['id']: org for org in orgs}
+    calls = Counter()
+    lock = threading.Lock()
+    rng = random.Random(config.seed)
+    window = {'start': time.monotonic(), 'count': 0}
+
+    @app.before_request
+    def simulate_network():
+        if request.path.startswith('/__'):
+            return None
+        with lock:
+            calls[f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'] += 1
+            fail = rng.random() < config.error_rate
+            delay = max(config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms), 0)
+            throttled = False
+            if config.rate_limit_rps:
+                now = time.monotonic()
+                if now - window['start'] >= 1.0:
+                    window['start'], window['count'] = now, 0
+                window['count'] += 1
+                throttled = window['count'] > config.rate_limit_rps
+                if throttled:
+                    calls['throttled'] += 1
+                request.environ['fake.rate_limit'] = {
+                    'X-RateLimit-Limit': str(config.rate_limit_rps),
+                    'X-RateLimit-Remaining': str(max(config.rate_limit_rps - window['count'], 0)),
+                    'X-RateLimit-Reset': f"{max(1.0 - (now - window['start']), 0.0):.3f}",
+                }
+        if throttled:
+            return jsonify({'error': 'rate limited'}), 429, {'Retry-After': '1'}
+        time.sleep(delay / 1000)
+        if fail:
+            return jsonify({'error': 'injected failure'}), 503
+        return None
+
+    @app.after_request
+    def rate_limit_headers(response):
+        response.headers.update(request.environ.get('fake.rate_limit', {}))
+        return response
+
+    @app.get('/__stats')
+    def stats():
+        with lock:
+            return jsonify({'calls': dict(calls),
+                            'total': sum(count for name, count in calls.items() if name != 'throttled'),
+                            'throttled': calls['throttled'],
+                            'config': asdict(config)})
+
+    @app.post('/__reset')
+    def reset():
+        with lock:
+            calls.clear()
+        return '', 204
+
+    @app.post('/api/organizations/search')
+    def search_organizations():
+        return jsonify({'total': len(orgs), 'results': orgs})
+
+    @app.post('/api/organizations')
+    def create_organization():
+        return jsonify({'id': f'org-{uuid.uuid4()}', **(request.get_json() or {})}), 201
+
+    @app.get('/api/organizations/<org_id>')
+    def get_organization(org_id):
+        org = orgs_by_id.get(org_id)
+        return (jsonify(org), 200) if org else (jsonify({'error': 'not found'}), 404)
+
+    @app.get('/api/organizations/<org_id>/tos-link')
+    def tos_link(org_id):
+        return jsonify({'tosLink': f'https://tos.example/{org_id}/{uuid.uuid4()}'})
+
+    @app.get('/api/organizations/<org_id>/kyc-link')
+    def kyc_link(org_id):
+        return jsonify({'kycLink': f'https://kyc.example/{org_id}/{uuid.uuid4()}'})
+
+    @app.get('/api/accounts')
+    def list_accounts():
+        return jsonify(accounts.get(request.headers.get('on-behalf-of'), []))
+
+    @app.post('/api/accounts')
+    def create_account():
+        return jsonify({'id': f'acc-{uuid.uuid4()}', **(request.get_json() or {})}), 201
+
+    @app.get('/api/accounts/<account_id>')
+    def get_account(account_id):
+        for account in accounts.get(request.headers.get('on-behalf-of'), []):
+            if account['id'] == account_id:
+                return jsonify(account)
+        return jsonify({'error': 'not found'}), 404
+
+    @app.post('/api/payouts/payout')
+    def create_payout():
+        return jsonify({'id': f'payout-{uuid.uuid4()}', 'status': 'AWAITING_EXECUTION',
+                        **(request.get_json() or {})}), 201
+
+    @app.post('/api/payouts/payout/<payout_id>/execute')
+    def execute_payout(payout_id):
+        return jsonify({'id': payout_id, 'status': 'PENDING'})
+
+    @app.post('/api/payouts/search')
+    def search_payouts():
+        history = payouts.get(request.headers.get('on-behalf-of'), [])
+        limit = int(request.args.get('limit', 10))
+        next_id = request.args.get('nextId')
+        start = 0
+        if next_id:
+            start = next((i for i, p in enumerate(history) if p['id'] == next_id), len(history))
+        page = history[start:start + limit]
+        body = {'total': len(history), 'results': page}
+        if start + limit < len(history):
+            body['nextId'] = history[start + limit]['id']
+        return jsonify(body)
+
+    return app
+
+
+def serve(config, port, ready=None):
+    """Run the stand-in until the process is terminated."""
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', port, create_app(config), threaded=True)
+    if ready is not None:
+        ready.set()
+    server.serve_forever()
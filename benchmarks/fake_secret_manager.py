@@ -0,0 +1,38 @@
+"""In-process stand-in for google.cloud.secretmanager.SecretManagerServiceClient."""
+import threading
+import time
+
+
+class _Payload:
+    def __init__(self, data):
+        self.data = data
+
+
+class _SecretVersion:
+    def __init__(self, data):
+        self.payload = _Payload(data)
+
+
+class FakeSecretManagerClient:
+    """Answers access_secret_version after a fixed delay and counts calls.
+
+    Counters are class-level so they survive the secret cache constructing
+    its own instance through the client factory.
+    """
+
+    latency_ms = 40.0
+    secrets = {'API_KEY': 'bench-api-key', 'TRANSFER_API_KEY': 'bench-transfer-key'}
+    calls = 0
+    _lock = threading.Lock()
+
+    def access_secret_version(self, request):
+        secret_id = request['name'].split('/secrets/')[1].split('/')[0]
+        with self._lock:
+            type(self).calls += 1
+        time.sleep(self.latency_ms / 1000)
+        return _SecretVersion(self.secrets[secret_id].encode('UTF-8'))
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.calls = 0
@@ -0,0 +1,202 @@
+"""Shared plumbing for the benchmarks: boot fakes, serve the app, drive load."""
+import importlib
+import logging
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import requests
+from werkzeug.serving import make_server
+
+BENCH_DIR = Path(__file__).resolve().parent
+FUNCTIONS_DIR = BENCH_DIR.parent / 'functions'
+
+from fake_muralpay import serve as serve_fake  # noqa: E402
+from fake_secret_manager import FakeSecretManagerClient  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class FakeMuralPay:
+    """Runs the MuralPay stand-in in a child process so it does not share our GIL."""
+
+    def __init__(self, config):
+        self.config = config
+        self.port = free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self._process = None
+
+    def __enter__(self):
+        ctx = multiprocessing.get_context('spawn')
+        ready = ctx.Event()
+        self._process = ctx.Process(target=serve_fake, args=(self.config, self.port, ready),
+                                    daemon=True)
+        self._process.start()
+        if not ready.wait(30):
+            raise RuntimeError('Fake MuralPay server did not start')
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join(5)
+
+    @property
+    def api_url(self):
+        return f'{self.base_url}/api'
+
+    def stats(self):
+        return requests.get(f'{self.base_url}/__stats', timeout=5).json()
+
+    def reset(self):
+        requests.post(f'{self.base_url}/__reset', timeout=5)
+
+
+def load_main(api_url, log_level='WARNING', secret_latency_ms=40.0, env=None):
+    """Import functions/main.py pointed at the fakes.
+
+    Must run before anything else imports `main`, since configuration is read
+    from the environment at import time.
+    """
+    os.environ['MURALPAY_BASE_URL'] = api_url
+    os.environ['LOG_LEVEL'] = log_level
+    os.environ.update(env or {})
+    if str(FUNCTIONS_DIR) not in sys.path:
+        sys.path.insert(0, str(FUNCTIONS_DIR))
+    main = importlib.import_module('main')
+    logging.getLogger().setLevel(log_level)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    FakeSecretManagerClient.latency_ms = secret_latency_ms
+    main.secret_cache._client_factory = FakeSecretManagerClient
+    main.secret_cache._client = None
+    return main
+
+
+def entry_app(main, entry='app'):
+    """WSGI app for `entry`: the Flask app itself, or the Firebase main_function."""
+    if entry == 'app':
+        return main.app
+    from flask import Flask, request
+
+    shim = Flask('main_function_shim')
+
+    @shim.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'OPTIONS'])
+    @shim.route('/<path:path>', methods=['GET', 'POST', 'OPTIONS'])
+    def dispatch(path):
+        return main.main_function(request)
+
+    return shim
+
+
+class AppServer:
+    """Serves a WSGI app on a background thread."""
+
+    def __init__(self, wsgi_app):
+        self.port = free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self._server = make_server('127.0.0.1', self.port, wsgi_app, threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    body: dict = None
+    headers: dict = field(default_factory=dict)
+    # When set, request i goes to paths[i % len(paths)] instead of `path`.
+    paths: list = None
+
+    def path_for(self, index):
+        return self.paths[index % len(self.paths)] if self.paths else self.path
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_scenario(base_url, scenario, concurrency, total_requests, fake=None):
+    """Drive one scenario with `concurrency` clients and summarise the run."""
+    if fake is not None:
+        fake.reset()
+    local = threading.local()
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def one_request(index):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.request(scenario.method, base_url + scenario.path_for(index),
+                                       json=scenario.body, headers=scenario.headers,
+                                       timeout=120)
+            status = response.status_code
+            response.content
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed_ms)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(total_requests)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    upstream = fake.stats() if fake is not None else None
+    upstream_calls = upstream['total'] if upstream is not None else None
+    return {
+        'scenario': scenario.name,
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'statuses': {str(k): v for k, v in statuses.items()},
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'throughput_rps': round(total_requests / wall, 2) if wall else 0.0,
+        'upstream_calls_per_request': (round(upstream_calls / total_requests, 2)
+                                       if upstream_calls is not None else None),
+        'upstream_429s': upstream['throttled'] if upstream is not None else None,
+        'secret_fetches': FakeSecretManagerClient.calls,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def format_table(rows, columns):
+    widths = {c: max(len(c), *(len(str(r.get(c))) for r in rows)) for c in columns}
+    lines = ['  '.join(c.ljust(widths[c]) for c in columns)]
+    lines += ['  '.join(str(r.get(c)).ljust(widths[c]) for c in columns) for r in rows]
+    return '\n'.join(lines)
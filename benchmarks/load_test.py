@@ -0,0 +1,116 @@
+"""Drive every read route of functions/main.py against local fakes.
+
+    python benchmarks/load_test.py --concurrency 16 --requests 200 --latency-ms 80
+
+Reports p50/p95/p99 latency, throughput, upstream calls per request, upstream
+429s, Secret Manager fetches and peak RSS per route. With `--profile PREFIX`
+every request is profiled and the hot-path report is written to PREFIX.json,
+with collapsed stacks for a flame graph in PREFIX.folded.
+"""
+import argparse
+import json
+import secrets
+
+import requests
+
+from fake_muralpay import FakeConfig
+from fake_secret_manager import FakeSecretManagerClient
+from harness import AppServer, FakeMuralPay, Scenario, entry_app, format_table, load_main, run_scenario
+
+COLUMNS = ['scenario', 'requests', 'concurrency', 'p50_ms', 'p95_ms', 'p99_ms',
+           'throughput_rps', 'upstream_calls_per_request', 'upstream_429s', 'secret_fetches',
+           'peak_rss_mb', 'statuses']
+
+
+def scenarios():
+    org_id = 'org-0000'
+    account_id = f'{org_id}-acc-0'
+    payout_filter = {'filter': {'type': 'payoutStatus',
+                                'statuses': ['AWAITING_EXECUTION', 'PENDING', 'EXECUTED',
+                                             'FAILED', 'CANCELED']}}
+    return [
+        Scenario('organizations', 'GET', '/api/organizations'),
+        Scenario('organization', 'GET', f'/api/organizations/{org_id}'),
+        Scenario('accounts_all', 'GET', '/api/accounts'),
+        Scenario('accounts', 'GET', f'/api/accounts/{org_id}'),
+        Scenario('account', 'GET', f'/api/accounts/{org_id}/{account_id}'),
+        Scenario('payouts', 'POST', f'/api/payouts/{org_id}/{account_id}', body=payout_filter),
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='fake MuralPay latency')
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--upstream-rate-limit', type=int, default=0,
+                        help='fake MuralPay quota in requests per second (0 = unlimited)')
+    parser.add_argument('--secret-latency-ms', type=float, default=40.0)
+    parser.add_argument('--orgs', type=int, default=20)
+    parser.add_argument('--accounts-per-org', type=int, default=3)
+    parser.add_argument('--payouts-per-org', type=int, default=200)
+    parser.add_argument('--entry', choices=['app', 'main_function'], default='app',
+                        help='serve the Flask app directly or through main_function')
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='request streamed NDJSON bodies where a route supports them')
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='profile every request; write PREFIX.json and PREFIX.folded')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    return parser.parse_args()
+
+
+def write_profile(url, token, prefix):
+    headers = {'X-Profile-Token': token}
+    report = requests.get(f'{url}/api/debug/profile', headers=headers, timeout=30)
+    report.raise_for_status()
+    with open(f'{prefix}.json', 'w') as out:
+        json.dump(report.json(), out, indent=2)
+    folded = requests.get(f'{url}/api/debug/profile', params={'format': 'folded'},
+                          headers=headers, timeout=30)
+    folded.raise_for_status()
+    with open(f'{prefix}.folded', 'w') as out:
+        out.write(folded.text)
+
+
+def main():
+    args = parse_args()
+    config = FakeConfig(orgs=args.orgs,
+                        accounts_per_org=args.accounts_per_org,
+                        payouts_per_org=args.payouts_per_org,
+                        latency_ms=args.latency_ms,
+                        jitter_ms=args.jitter_ms,
+                        error_rate=args.error_rate,
+                        rate_limit_rps=args.upstream_rate_limit)
+
+    profile_token = secrets.token_hex(16) if args.profile else None
+    env = {'PROFILE_TOKEN': profile_token} if profile_token else None
+    with FakeMuralPay(config) as fake:
+        app_module = load_main(fake.api_url, args.log_level, args.secret_latency_ms, env=env)
+        with AppServer(entry_app(app_module, args.entry)) as server:
+            results = []
+            for scenario in scenarios():
+                if args.only and scenario.name not in args.only:
+                    continue
+                if args.ndjson:
+                    scenario.headers['Accept'] = 'application/x-ndjson'
+                if profile_token:
+                    scenario.headers['X-Profile-Token'] = profile_token
+                FakeSecretManagerClient.reset()
+                results.append(run_scenario(server.url, scenario, args.concurrency,
+                                            args.requests, fake))
+            if profile_token:
+                write_profile(server.url, profile_token, args.profile)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_table(results, COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Cold-start cost of functions/main.py: import time and time to first response.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --top 25 --json
+
+Import cost comes from `python -X importtime -c "import main"` in a fresh
+interpreter, reported as the total for `main` and the heaviest modules it
+pulls in. Time to first response spawns a fresh process that imports main and
+serves it, then measures from spawn until the first
+GET /api/organizations/<id> against the fake MuralPay answers.
+Each figure is the median over `--runs` fresh processes.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Only the stdlib at module level: the --serve child must import main cold.
+BENCH_DIR = Path(__file__).resolve().parent
+FUNCTIONS_DIR = BENCH_DIR.parent / 'functions'
+
+
+def parse_importtime(stderr):
+    """Cumulative microseconds per module from -X importtime output, plus each module's depth."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(cumulative), depth)
+    return modules
+
+
+def import_profile(runs, api_url):
+    env = {**os.environ, 'MURALPAY_BASE_URL': api_url, 'LOG_LEVEL': 'WARNING'}
+    totals = []
+    direct = defaultdict(list)
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'],
+                                cwd=FUNCTIONS_DIR, env=env, capture_output=True, text=True,
+                                check=True)
+        modules = parse_importtime(result.stderr)
+        totals.append(modules['main'][0] / 1000)
+        for name, (cumulative, depth) in modules.items():
+            # Depth 1 is what main imports directly.
+            if depth == 1:
+                direct[name].append(cumulative / 1000)
+    heaviest = sorted(((name, statistics.median(values)) for name, values in direct.items()),
+                      key=lambda item: item[1], reverse=True)
+    return statistics.median(totals), heaviest
+
+
+def first_response(runs, api_url, org_id, secret_latency_ms):
+    import requests
+    from harness import free_port
+
+    samples = []
+    for _ in range(runs):
+        port = free_port()
+        url = f'http://127.0.0.1:{port}/api/organizations/{org_id}'
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, str(BENCH_DIR / 'startup.py'), '--serve',
+                                    str(port), api_url, str(secret_latency_ms)],
+                                   stdout=subprocess.PIPE, text=True)
+        try:
+            while True:
+                try:
+                    response = requests.get(url, timeout=30)
+                except requests.ConnectionError:
+                    if process.poll() is not None:
+                        raise RuntimeError('Server process exited before answering')
+                    time.sleep(0.005)
+                    continue
+                answered = time.perf_counter()
+                break
+            import_ms = json.loads(process.stdout.readline())['import_ms']
+            samples.append({
+                'import_ms': import_ms,
+                'first_response_ms': (answered - start) * 1000,
+                'status': response.status_code,
+            })
+        finally:
+            process.terminate()
+            process.wait(10)
+    return {
+        'import_main_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+        'spawn_to_first_response_ms': round(statistics.median(s['first_response_ms'] for s in samples), 1),
+        'statuses': sorted({s['status'] for s in samples}),
+    }
+
+
+def serve(port, api_url, secret_latency_ms):
+    """Child process: import main cold, then serve it. Imports nothing heavy first."""
+    os.environ['MURALPAY_BASE_URL'] = api_url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, str(FUNCTIONS_DIR))
+    start = time.perf_counter()
+    import main
+    import_ms = (time.perf_counter() - start) * 1000
+
+    import logging
+    from fake_secret_manager import FakeSecretManagerClient
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    FakeSecretManagerClient.latency_ms = secret_latency_ms
+    main.secret_cache._client_factory = FakeSecretManagerClient
+    server = make_server('127.0.0.1', port, main.app, threaded=True)
+    print(json.dumps({'import_ms': import_ms}), flush=True)
+    server.serve_forever()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per measurement')
+    parser.add_argument('--top', type=int, default=15, help='heaviest direct imports to list')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='fake MuralPay latency')
+    parser.add_argument('--secret-latency-ms', type=float, default=40.0)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    return parser.parse_args()
+
+
+def main():
+    from fake_muralpay import FakeConfig
+    from harness import FakeMuralPay, format_table
+
+    args = parse_args()
+    config = FakeConfig(orgs=1, accounts_per_org=1, payouts_per_org=0,
+                        latency_ms=args.latency_ms, jitter_ms=0.0)
+    with FakeMuralPay(config) as fake:
+        total_ms, heaviest = import_profile(args.runs, fake.api_url)
+        startup = first_response(args.runs, fake.api_url, 'org-0000', args.secret_latency_ms)
+
+    result = {
+        'importtime_main_ms': round(total_ms, 1),
+        **startup,
+        'heaviest_imports': [{'module': name, 'cumulative_ms': round(ms, 1)}
+                             for name, ms in heaviest[:args.top]],
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(format_table([{k: v for k, v in result.items() if k != 'heaviest_imports'}],
+                       ['importtime_main_ms', 'import_main_ms', 'spawn_to_first_response_ms',
+                        'statuses']))
+    print()
+    print(format_table(result['heaviest_imports'], ['module', 'cumulative_ms']))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == '--serve':
+        serve(int(sys.argv[2]), sys.argv[3], float(sys.argv[4]))
+    else:
+        main()
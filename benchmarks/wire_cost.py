@@ -0,0 +1,137 @@
+"""Bytes on the wire and CPU per response, before and after fast JSON and compression.
+
+    python benchmarks/wire_cost.py --requests 200
+    python benchmarks/wire_cost.py --orgs 200 --payouts-per-org 2000 --json
+
+Every read route of functions/main.py is called in-process through the Flask
+test client against a zero-latency fake MuralPay, under these configurations:
+
+- before: the stdlib JSON backend with compression disabled
+- orjson: the fast backend, still uncompressed
+- orjson+gzip, orjson+br: the fast backend with negotiated compression
+  (br only when a brotli module is installed)
+
+CPU is process time per response, including the app and the test client.
+A second table isolates encoding and compression on each route's payload.
+"""
+import argparse
+import json
+import time
+
+from fake_muralpay import FakeConfig
+from harness import FakeMuralPay, format_table, load_main
+from load_test import scenarios
+
+ROUTE_COLUMNS = ['scenario', 'config', 'wire_bytes', 'cpu_ms_per_response', 'statuses']
+ENCODE_COLUMNS = ['scenario', 'json_bytes', 'stdlib_encode_ms', 'orjson_encode_ms',
+                  'gzip_bytes', 'gzip_ms', 'br_bytes', 'br_ms']
+
+
+def configurations(serialization, compressor):
+    configs = [('before', 'stdlib', None)]
+    if 'orjson' in serialization.BACKENDS:
+        configs.append(('orjson', 'orjson', None))
+    fast = serialization.BACKENDS[0]
+    for encoding in reversed(compressor.encodings):
+        configs.append((f'{fast}+{encoding}', fast, encoding))
+    return configs
+
+
+def time_per_call(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    return (time.process_time() - start) * 1000 / repeat, result
+
+
+def measure_route(client, scenario, requests_per_config, configs, serialization, compressor):
+    rows = []
+    for name, backend, encoding in configs:
+        serialization.set_backend(backend)
+        compressor.enabled = encoding is not None
+        headers = {**scenario.headers, 'Accept-Encoding': encoding or 'identity'}
+
+        def call():
+            return client.open(scenario.path, method=scenario.method, json=scenario.body,
+                               headers=headers)
+
+        call()  # warm the response cache so every configuration sees the same upstream work
+        cpu_ms, response = time_per_call(call, requests_per_config)
+        rows.append({
+            'scenario': scenario.name,
+            'config': name,
+            'wire_bytes': len(response.data),
+            'cpu_ms_per_response': round(cpu_ms, 3),
+            'statuses': response.status_code,
+        })
+    return rows
+
+
+def measure_encoding(name, payload, repeat, serialization, compressor):
+    row = {'scenario': name}
+    for backend in ('stdlib', 'orjson'):
+        if backend not in serialization.BACKENDS:
+            row[f'{backend}_encode_ms'] = None
+            continue
+        serialization.set_backend(backend)
+        row[f'{backend}_encode_ms'], body = time_per_call(
+            lambda: serialization.dumps_bytes(payload), repeat)
+        row[f'{backend}_encode_ms'] = round(row[f'{backend}_encode_ms'], 3)
+    row['json_bytes'] = len(body)
+    for encoding in ('gzip', 'br'):
+        if encoding not in compressor.encodings:
+            row[f'{encoding}_bytes'] = row[f'{encoding}_ms'] = None
+            continue
+        cpu_ms, compressed = time_per_call(lambda: compressor.compress(body, encoding), repeat)
+        row[f'{encoding}_bytes'] = len(compressed)
+        row[f'{encoding}_ms'] = round(cpu_ms, 3)
+    return row
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='requests per route and configuration')
+    parser.add_argument('--orgs', type=int, default=50)
+    parser.add_argument('--accounts-per-org', type=int, default=3)
+    parser.add_argument('--payouts-per-org', type=int, default=1000)
+    parser.add_argument('--payout-limit', type=int, default=500, help='rows per payout page')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = FakeConfig(orgs=args.orgs, accounts_per_org=args.accounts_per_org,
+                        payouts_per_org=args.payouts_per_org, latency_ms=0.0, jitter_ms=0.0)
+    with FakeMuralPay(config) as fake:
+        app_module = load_main(fake.api_url, secret_latency_ms=0.0)
+        import serialization
+
+        compressor = app_module.response_compressor
+        # Compress everything the routes return, however small.
+        compressor.min_bytes = 0
+        client = app_module.app.test_client()
+        configs = configurations(serialization, compressor)
+        route_rows, encode_rows = [], []
+        for scenario in scenarios():
+            if scenario.name == 'payouts':
+                scenario.path += f'?limit={args.payout_limit}'
+            route_rows += measure_route(client, scenario, args.requests, configs,
+                                        serialization, compressor)
+            serialization.set_backend('stdlib')
+            compressor.enabled = False
+            payload = client.open(scenario.path, method=scenario.method, json=scenario.body).json
+            encode_rows.append(measure_encoding(scenario.name, payload, args.requests,
+                                                serialization, compressor))
+
+    if args.json:
+        print(json.dumps({'routes': route_rows, 'encoding': encode_rows}, indent=2))
+        return
+    print(format_table(route_rows, ROUTE_COLUMNS))
+    print()
+    print(format_table(encode_rows, ENCODE_COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,640 @@
+"""asyncio serving mode for the MuralPay proxy.
+
+Serves the organization, account and payout routes of `main.app` from a
+Starlette ASGI app. Upstream calls go through AsyncUpstreamClient and secrets
+are awaited, so a single instance keeps many requests open while MuralPay
+responds instead of parking one thread per request. /geo, /batch, the bulk
+payout routes, grid queries and NDJSON streaming are only served by
+`main.app`. Firebase's `https_fn.on_request` only dispatches to WSGI, so this
+mode is deployed as its own service, with its extra dependencies:
+
+    pip install -r requirements-async.txt
+    uvicorn async_app:app --port 8080
+
+Configuration, the response and secret caches, circuit breakers, payout
+cursors and the error, query and geo helpers are shared with main.py.
+"""
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import serialization
+from coalesce import AsyncSingleFlight, request_key
+from cors import IMPLICIT_METHODS
+from main import (
+    BadRequestError,
+    PayoutPager,
+    base_url,
+    cors_policy,
+    decode_payout_cursor,
+    encode_payout_cursor,
+    error_status,
+    is_upstream_unavailable as is_sync_upstream_unavailable,
+    link_cache,
+    link_cache_key,
+    logger,
+    lookup_geo,
+    org_enrichment_timeout,
+    parse_int,
+    payout_page_limit,
+    payout_page_max_limit,
+    raise_for_status,
+    response_cache,
+    response_compressor,
+    restricted_country_error,
+    secret_cache,
+    shed_retry_after,
+    stale_fallback,
+    upstream as sync_upstream,
+)
+from resilience import ConcurrencyLimiter
+from tracing import CORRELATION_HEADER, request_correlation_id, request_trace, server_timing, span
+from upstream import AsyncUpstreamClient
+
+upstream = AsyncUpstreamClient(
+    base_url,
+    max_connections=int(os.environ.get('ASYNC_UPSTREAM_MAX_CONNECTIONS', 100)),
+    retry_policy=sync_upstream.retry_policy,
+    breakers=sync_upstream.breakers,
+    rate_limiter=sync_upstream.rate_limiter)
+
+coalescer = AsyncSingleFlight()
+
+# A request costs a coroutine rather than a thread here, so the cap is higher.
+request_limiter = ConcurrencyLimiter(int(os.environ.get('ASYNC_MAX_CONCURRENT_REQUESTS', 512)))
+
+# Upstream calls in flight per request fan-out (TOS/KYC enrichment, per-org accounts).
+fanout_concurrency = int(os.environ.get('ASYNC_FANOUT_CONCURRENCY', 32))
+
+# Per-request flags set anywhere below the route (e.g. by a coalesced loader task).
+request_state = ContextVar('request_state', default=None)
+
+
+# --- Request plumbing ---
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return serialization.dumps_bytes(content)
+
+
+def json_response(data, status=200, headers=None):
+    with span('json.encode'):
+        return FastJSONResponse(data, status_code=status, headers=headers)
+
+
+def cacheable_json(request, data, status):
+    """JSON response with an ETag so browsers can revalidate with If-None-Match."""
+    response = json_response(data, status)
+    etag = f'"{hashlib.sha1(response.body).hexdigest()}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    response.headers.update(headers)
+    # Weak comparison: a compressed response carries the weak form of the ETag.
+    if_none_match = [tag.strip().removeprefix('W/')
+                     for tag in request.headers.get('if-none-match', '').split(',')]
+    if status == 200 and (etag in if_none_match or '*' in if_none_match):
+        return Response(status_code=304, headers=headers)
+    return response
+
+
+def error_response(e):
+    """Map an exception raised while serving a route to an error response, like main.py."""
+    status, headers = error_status(e)
+    return json_response({"error": str(e)}, status, headers=headers or None)
+
+
+def restricted_country_response(request):
+    """A 451 response if the caller is in a restricted country, else None."""
+    ip, country = lookup_geo(request.headers.get('x-forwarded-for'),
+                             request.client.host if request.client else None)
+    error = restricted_country_error(ip, country, request.url.path)
+    return None if error is None else json_response({"error": error}, 451)
+
+
+def query_int(request, name, default, minimum, maximum):
+    """Read an integer query parameter, clamped to [minimum, maximum]."""
+    return parse_int(name, request.query_params.get(name), default, minimum, maximum)
+
+
+def is_upstream_unavailable(e):
+    return isinstance(e, httpx.TransportError) or is_sync_upstream_unavailable(e)
+
+
+def compress_response(request, response):
+    """Compress a JSON body in place when the client accepts gzip or brotli."""
+    body = getattr(response, 'body', b'')
+    if ('content-encoding' in response.headers or response.status_code in (204, 304)
+            or not response_compressor.eligible(len(body), response.media_type)):
+        return
+    response.headers.append('Vary', 'Accept-Encoding')
+    encoding = response_compressor.negotiate(request.headers.get('accept-encoding'))
+    if encoding is None:
+        return
+    with span('compress', encoding=encoding, size_bytes=len(body)):
+        response.body = response_compressor.compress(body, encoding)
+    response.headers['content-encoding'] = encoding
+    response.headers['content-length'] = str(len(response.body))
+    etag = response.headers.get('etag')
+    if etag and not etag.startswith('W/'):
+        response.headers['etag'] = f'W/{etag}'
+
+
+def finalize_response(request, response, started):
+    compress_response(request, response)
+    duration_ms = (time.perf_counter() - started) * 1000
+    trace = request_trace.get()
+    if request_state.get().get('served_stale'):
+        response.headers['Warning'] = '110 - "Response is Stale"'
+    response.headers['Server-Timing'] = server_timing(trace, duration_ms)
+    response.headers[CORRELATION_HEADER] = request_correlation_id.get()
+    logger.info('Outgoing response',
+                response_data=lambda: {'status_code': response.status_code,
+                                       'duration_ms': round(duration_ms, 2)},
+                spans=lambda: [record.as_dict() for record in trace])
+    logger.debug('Instance stats',
+                 upstream=upstream.stats,
+                 request_limiter=request_limiter.stats,
+                 coalescing=coalescer.stats,
+                 response_cache=response_cache.stats,
+                 compression=response_compressor.stats,
+                 logging=logger.stats)
+
+    response.headers.add_vary_header('Origin')
+    response.headers.update(cors_policy.response_headers(request.headers.get('Origin')))
+    return response
+
+
+def preflight_response(request):
+    """Answer an OPTIONS request from the route table, like main.preflight does."""
+    path = request.url.path
+    methods = sorted({method for route in request.app.routes if route.path_regex.match(path)
+                      for method in route.methods} - IMPLICIT_METHODS)
+    return Response(status_code=204,
+                    headers=cors_policy.preflight_headers(request.headers.get('Origin'), methods))
+
+
+def endpoint(handler):
+    """Wrap a route coroutine with the per-request work main.py does in its hooks.
+
+    Answers preflights before anything else, then sets up the correlation id
+    and trace, sheds load past the concurrency cap, and stamps timing and CORS
+    headers on the way out.
+    """
+    async def wrapper(request):
+        if request.method == 'OPTIONS':
+            return preflight_response(request)
+        started = time.perf_counter()
+        tokens = [
+            (request_trace, request_trace.set([])),
+            (request_correlation_id, request_correlation_id.set(
+                request.headers.get(CORRELATION_HEADER) or str(uuid.uuid4()))),
+            (request_state, request_state.set({})),
+        ]
+        holds_slot = False
+        try:
+            logger.info('Incoming request',
+                        request_data=lambda: {'method': request.method,
+                                              'path': request.url.path,
+                                              'query_params': dict(request.query_params)})
+            if not request_limiter.try_acquire():
+                logger.warning('Shedding request, instance at capacity',
+                               limiter=request_limiter.stats())
+                response = json_response({"error": "Server is at capacity, retry shortly"}, 503,
+                                         headers={'Retry-After': str(shed_retry_after)})
+            else:
+                holds_slot = True
+                with span('dispatch', method=request.method, path=request.url.path):
+                    response = await handler(request, **request.path_params)
+            return finalize_response(request, response, started)
+        finally:
+            if holds_slot:
+                request_limiter.release()
+            for var, token in reversed(tokens):
+                var.reset(token)
+
+    wrapper.__name__ = handler.__name__
+    return wrapper
+
+
+async def cached_read(key, loader):
+    """Read through the response cache, serving stale data if upstream is down."""
+    value = response_cache.get(key)
+    if value is not None:
+        return value
+    try:
+        value = await loader()
+    except Exception as e:
+        stale = stale_fallback(key, e, is_upstream_unavailable)
+        if stale is None:
+            raise
+        request_state.get()['served_stale'] = True
+        return stale
+    response_cache.set(key, value)
+    return value
+
+
+async def get_secret(secret_id: str) -> str:
+    """Cached secrets are returned inline; a miss is fetched off the event loop."""
+    try:
+        with span('secret', secret_id=secret_id):
+            value = secret_cache.peek(secret_id)
+            if value is None:
+                value = await asyncio.to_thread(secret_cache.get, secret_id)
+            return value
+    except Exception as e:
+        logger.error('Failed to fetch secret',
+                     secret_id=secret_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        raise
+
+
+async def call(method, endpoint, path, api_key, org_id=None, **kwargs):
+    response = await upstream.request(method, endpoint, path, api_key, org_id, **kwargs)
+    raise_for_status(response)
+    return upstream.decode(response), response.status_code
+
+
+async def gather_limited(coros, limit=None):
+    """Run coroutines concurrently, at most `limit` at a time, returning exceptions."""
+    semaphore = asyncio.Semaphore(limit or fanout_concurrency)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=True)
+
+
+# --- MuralPay API Calls ---
+async def enrich_organization(org, api_key):
+    """Return a copy of an organization with its TOS/KYC links attached."""
+    org = {**org, 'kycStatus': dict(org['kycStatus'])}
+    if org['tosStatus'] != 'ACCEPTED':
+        cache_key = link_cache_key('tos_link', org)
+        tos_link = link_cache.get(cache_key)
+        if tos_link is None:
+            data, _ = await call('GET', 'tos_link', f"/organizations/{org['id']}/tos-link", api_key)
+            tos_link = data['tosLink']
+            link_cache.set(cache_key, tos_link)
+        org['tosStatus'] = tos_link
+    elif org['kycStatus']['type'] == 'INACTIVE':
+        cache_key = link_cache_key('kyc_link', org)
+        kyc_link = link_cache.get(cache_key)
+        if kyc_link is None:
+            data, _ = await call('GET', 'kyc_link', f"/organizations/{org['id']}/kyc-link", api_key)
+            kyc_link = data['kycLink']
+            link_cache.set(cache_key, kyc_link)
+        org['kycStatus']['kycUrl'] = kyc_link
+    return org
+
+
+async def enrich_organizations(org_list, api_key, timeout=None):
+    """Enrich organizations concurrently; failures and stragglers are marked, not fatal."""
+    timeout = org_enrichment_timeout if timeout is None else timeout
+    semaphore = asyncio.Semaphore(fanout_concurrency)
+
+    async def enrich(org):
+        async with semaphore:
+            return await enrich_organization(org, api_key)
+
+    tasks = [asyncio.ensure_future(enrich(org)) for org in org_list]
+    pending = set()
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    enriched = []
+    for org, task in zip(org_list, tasks):
+        if task in pending:
+            result = TimeoutError(f'Enrichment timed out after {timeout} seconds')
+        else:
+            result = task.exception() or task.result()
+        if isinstance(result, Exception):
+            logger.warning('Organization enrichment failed',
+                           org_id=org['id'],
+                           error=str(result),
+                           error_type=type(result).__name__)
+            result = {**org, 'enrichmentError': str(result)}
+        enriched.append(result)
+    return enriched
+
+
+async def organization_search_call(api_key: str):
+    data, status = await call('POST', 'organization_search', "/organizations/search", api_key,
+                              json={"filter": {"type": "name"}})
+    return data['results'], status
+
+
+async def organization_call(api_key: str, org_id: str):
+    return await cached_read(('organization', org_id, None),
+                             lambda: call('GET', 'organization', f"/organizations/{org_id}", api_key))
+
+
+async def account_call(api_key: str, org_id: str, account_id: str):
+    return await cached_read(('account', org_id, account_id),
+                             lambda: call('GET', 'account', f"/accounts/{account_id}", api_key, org_id))
+
+
+async def account_list_call(api_key: str, org_id: str):
+    return await cached_read(('account_list', org_id, None),
+                             lambda: call('GET', 'account_list', "/accounts", api_key, org_id))
+
+
+class AsyncPayoutPager(PayoutPager):
+    """PayoutPager whose upstream pages are awaited; iterate with `async for`."""
+
+    async def __aiter__(self):
+        page_cursor, offset = self.position
+        while self.pages_fetched < self.max_pages:
+            data, _ = await call('POST', 'payout_search', "/payouts/search",
+                                 self.api_key, self.org_id, json=self.payload,
+                                 params=self.page_params(page_cursor))
+            self.pages_fetched += 1
+            for payout in self.scan_page(page_cursor, offset, data):
+                yield payout
+            if self.position is None:
+                return
+            page_cursor, offset = self.position
+
+    async def take(self, limit):
+        page = []
+        rows = self.__aiter__()
+        try:
+            async for payout in rows:
+                page.append(payout)
+                if len(page) >= limit:
+                    break
+        finally:
+            await rows.aclose()
+        return page
+
+
+# --- Routes ---
+@endpoint
+async def get_organization(request, org_id):
+    try:
+        api_key = await get_secret("API_KEY")
+        data, status = await coalescer.do(request_key('get_organization', org_id),
+                                          lambda: organization_call(api_key, org_id))
+        return cacheable_json(request, data, status)
+    except Exception as e:
+        logger.error('Error fetching organization',
+                     org_id=org_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def get_organizations(request):
+    try:
+        api_key = await get_secret("API_KEY")
+
+        async def load():
+            org_list, status = await organization_search_call(api_key)
+            return await enrich_organizations(org_list, api_key), status
+
+        data, status = await coalescer.do(request_key('get_organizations'), load)
+        return json_response(data, status)
+    except Exception as e:
+        logger.error('Error fetching organizations list',
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def create_organization(request):
+    try:
+        api_key = await get_secret("API_KEY")
+        body = await request.json()
+        data, status = await call('POST', 'organization_create', "/organizations", api_key,
+                                  json=body)
+        response_cache.invalidate(org_id=data.get('id'))
+        logger.info('Organization created successfully',
+                    org_id=data.get('id'),
+                    status_code=status)
+        return json_response(data, status)
+    except Exception as e:
+        logger.error('Error creating organization',
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def get_accounts_by_organization(request):
+    try:
+        skip_empty = request.query_params.get('skipEmpty', 'false').lower() == 'true'
+        api_key = await get_secret("API_KEY")
+
+        async def load():
+            org_list, status = await organization_search_call(api_key)
+            results = await gather_limited(account_list_call(api_key, org['id']) for org in org_list)
+            groups = []
+            for org, result in zip(org_list, results):
+                group = {
+                    'organization': {key: org.get(key) for key in ('id', 'name', 'firstName', 'lastName')},
+                    'accounts': []
+                }
+                if isinstance(result, Exception):
+                    logger.warning('Failed to fetch accounts for organization',
+                                   org_id=org['id'],
+                                   error=str(result),
+                                   error_type=type(result).__name__)
+                    group['error'] = str(result)
+                else:
+                    group['accounts'] = result[0]
+                if skip_empty and not group['accounts'] and 'error' not in group:
+                    continue
+                groups.append(group)
+            return groups, status
+
+        data, status = await coalescer.do(
+            request_key('get_accounts_by_organization', body={'skipEmpty': skip_empty}), load)
+        return json_response(data, status)
+    except Exception as e:
+        logger.error('Error fetching accounts by organization',
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def get_accounts(request, org_id):
+    try:
+        api_key = await get_secret("API_KEY")
+        data, status = await coalescer.do(request_key('get_accounts', org_id),
+                                          lambda: account_list_call(api_key, org_id))
+        return cacheable_json(request, data, status)
+    except Exception as e:
+        logger.error('Error fetching accounts list',
+                     org_id=org_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def get_account_by_id(request, org_id, account_id):
+    try:
+        api_key = await get_secret("API_KEY")
+        data, status = await coalescer.do(request_key('get_account_by_id', org_id, account_id),
+                                          lambda: account_call(api_key, org_id, account_id))
+        return cacheable_json(request, data, status)
+    except Exception as e:
+        logger.error('Error fetching account',
+                     org_id=org_id,
+                     account_id=account_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def create_account(request, org_id):
+    try:
+        api_key = await get_secret("API_KEY")
+        body = await request.json()
+        data, status = await call('POST', 'account_create', "/accounts", api_key, org_id, json=body)
+        response_cache.invalidate('account_list', org_id)
+        logger.info('Account created successfully',
+                    org_id=org_id,
+                    account_id=data.get('id'),
+                    status_code=status)
+        return json_response(data, status)
+    except Exception as e:
+        logger.error('Error creating account',
+                     org_id=org_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def get_payout_requests(request, org_id, acc_id):
+    try:
+        api_key = await get_secret("API_KEY")
+        body = await request.json()
+        limit = query_int(request, 'limit', payout_page_limit, 1, payout_page_max_limit)
+        position = decode_payout_cursor(request.query_params.get('nextId'))
+
+        async def load_page():
+            pager = AsyncPayoutPager(api_key, org_id, acc_id, body, position=position)
+            page = await pager.take(limit)
+            logger.debug('Payout requests page built',
+                         org_id=org_id,
+                         account_id=acc_id,
+                         count=len(page),
+                         upstream_pages=pager.pages_fetched)
+            return page, pager.position
+
+        page, next_position = await coalescer.do(
+            request_key('get_payout_requests', org_id, acc_id,
+                        {'body': body, 'limit': limit, 'position': position}),
+            load_page)
+        next_id = encode_payout_cursor(next_position)
+        return json_response(page, 200, headers={'X-Next-Id': next_id} if next_id else None)
+    except BadRequestError as e:
+        logger.warning('Invalid payout requests query',
+                       org_id=org_id,
+                       account_id=acc_id,
+                       error=str(e))
+        return json_response({"error": str(e)}, 400)
+    except Exception as e:
+        logger.error('Error fetching payout requests',
+                     org_id=org_id,
+                     account_id=acc_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def execute_payout_requests(request, org_id, acc_id, payout_id):
+    blocked = restricted_country_response(request)
+    if blocked is not None:
+        return blocked
+    try:
+        api_key, transfer_api_key = await asyncio.gather(get_secret("API_KEY"),
+                                                         get_secret("TRANSFER_API_KEY"))
+        data, status = await call('POST', 'payout_execute', f"/payouts/payout/{payout_id}/execute",
+                                  api_key, org_id, headers={"transfer-api-key": transfer_api_key})
+        response_cache.invalidate('account', org_id)
+        response_cache.invalidate('account_list', org_id)
+        logger.info('Payout executed successfully',
+                    org_id=org_id,
+                    account_id=acc_id,
+                    payout_id=payout_id,
+                    status_code=status)
+        return json_response(data, status)
+    except Exception as e:
+        logger.error('Error executing payout',
+                     org_id=org_id,
+                     account_id=acc_id,
+                     payout_id=payout_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@endpoint
+async def create_payout_requests(request, org_id):
+    blocked = restricted_country_response(request)
+    if blocked is not None:
+        return blocked
+    try:
+        api_key = await get_secret("API_KEY")
+        body = await request.json()
+        data, status = await call('POST', 'payout_create', "/payouts/payout", api_key, org_id,
+                                  json=body)
+        response_cache.invalidate('account', org_id)
+        response_cache.invalidate('account_list', org_id)
+        logger.info('Payout created successfully',
+                    org_id=org_id,
+                    payout_id=data.get('id'),
+                    status_code=status)
+        return json_response(data, status)
+    except Exception as e:
+        logger.error('Error creating payout',
+                     org_id=org_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+def routes(path, handler, method):
+    """The route under both the bare and /api prefixes, like main.py registers them."""
+    return [Route(prefix + path, handler, methods=[method, 'OPTIONS']) for prefix in ('', '/api')]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await upstream.aclose()
+
+
+app = Starlette(
+    routes=[
+        *routes('/organizations', get_organizations, 'GET'),
+        *routes('/organizations', create_organization, 'POST'),
+        *routes('/organizations/{org_id}', get_organization, 'GET'),
+        *routes('/accounts', get_accounts_by_organization, 'GET'),
+        *routes('/accounts/{org_id}', get_accounts, 'GET'),
+        *routes('/accounts/{org_id}', create_account, 'POST'),
+        *routes('/accounts/{org_id}/{account_id}', get_account_by_id, 'GET'),
+        # Before the {org_id}/{acc_id} pattern, which would also match it.
+        *routes('/payouts/create/{org_id}', create_payout_requests, 'POST'),
+        *routes('/payouts/{org_id}/{acc_id}', get_payout_requests, 'POST'),
+        *routes('/payouts/{org_id}/{acc_id}/{payout_id}', execute_payout_requests, 'POST'),
+    ],
+    lifespan=lifespan)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'value', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block and receive the same result (or exception). Results
+    are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executed': 0, 'coalesced': 0, 'errors': 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executed'] += 1
+            else:
+                call.waiters += 1
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            return call.value
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            total = self._stats['executed'] + self._stats['coalesced']
+            return {
+                **self._stats,
+                'in_flight': len(self._calls),
+                'hit_rate': round(self._stats['coalesced'] / total, 4) if total else 0.0,
+            }
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines sharing one event loop."""
+
+    def __init__(self):
+        self._tasks = {}
+        self._stats = {'executed': 0, 'coalesced': 0, 'errors': 0}
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            self._stats['executed'] += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._stats['coalesced'] += 1
+        # Shield so one cancelled waiter does not cancel the shared call.
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._tasks.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            self._stats['errors'] += 1
+
+    def stats(self):
+        total = self._stats['executed'] + self._stats['coalesced']
+        return {
+            **self._stats,
+            'in_flight': len(self._tasks),
+            'hit_rate': round(self._stats['coalesced'] / total, 4) if total else 0.0,
+        }
+
+
+def request_key(route, org_id=None, resource_id=None, body=None):
+    """Coalescing key for a read: the route, its ids and a normalized body."""
+    normalized = json.dumps(body, sort_keys=True, separators=(',', ':')) if body is not None else None
+    return route, org_id, resource_id, normalized
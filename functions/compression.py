@@ -0,0 +1,62 @@
+import gzip
+import threading
+import time
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/html'}
+
+
+class ResponseCompressor:
+    """Accept-Encoding negotiation and compression for buffered response bodies.
+
+    Bodies under `min_bytes`, or of a type that does not compress well, are
+    left alone. Brotli is preferred over gzip when the client accepts both
+    and a brotli module is installed.
+    """
+
+    def __init__(self, min_bytes=1024, gzip_level=6, brotli_quality=4, enabled=True):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.enabled = enabled
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self._lock = threading.Lock()
+        self._stats = {'compressed': 0, 'bytes_in': 0, 'bytes_out': 0, 'compress_ms': 0.0}
+
+    def eligible(self, size, mimetype):
+        return self.enabled and size >= self.min_bytes and mimetype in COMPRESSIBLE_MIMETYPES
+
+    def negotiate(self, accept_encoding):
+        """The coding to use for an Accept-Encoding header, or None for identity."""
+        if not accept_encoding:
+            return None
+        return parse_accept_header(accept_encoding).best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        start = time.perf_counter()
+        if encoding == 'br':
+            body = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            body = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        with self._lock:
+            self._stats['compressed'] += 1
+            self._stats['bytes_in'] += len(data)
+            self._stats['bytes_out'] += len(body)
+            self._stats['compress_ms'] += (time.perf_counter() - start) * 1000
+        return body
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['compress_ms'] = round(stats['compress_ms'], 2)
+        stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 4) if stats['bytes_in'] else None
+        return stats
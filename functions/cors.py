@@ -0,0 +1,105 @@
+import threading
+
+from werkzeug.wrappers import Response
+
+# Methods a preflight never needs to be told about: HEAD rides along with GET,
+# and OPTIONS is the preflight itself.
+IMPLICIT_METHODS = frozenset(('HEAD', 'OPTIONS'))
+
+
+class CorsPolicy:
+    """Origin allowlist and the CORS headers for actual and preflight responses.
+
+    Only origins in `allowed_origins` (or any origin, if it contains `*`) get
+    an Access-Control-Allow-Origin; for anyone else the headers are left off
+    and the browser blocks the response. Preflights are cacheable by the
+    browser for `max_age` seconds per origin and URL.
+    """
+
+    def __init__(self, allowed_origins, allow_headers, expose_headers, max_age=86400):
+        self.allowed_origins = frozenset(origin.rstrip('/') for origin in allowed_origins)
+        self.allow_any = '*' in self.allowed_origins
+        self.allow_headers = ', '.join(allow_headers)
+        self.expose_headers = ', '.join(expose_headers)
+        self.max_age = str(int(max_age))
+
+    def allowed_origin(self, origin):
+        """The origin to echo back, or None if it is not allowed."""
+        if origin and (self.allow_any or origin in self.allowed_origins):
+            return origin
+        return None
+
+    def response_headers(self, origin):
+        """CORS headers for an actual (non-preflight) response; callers also add `Vary: Origin`."""
+        origin = self.allowed_origin(origin)
+        if origin is None:
+            return {}
+        return {'Access-Control-Allow-Origin': origin,
+                'Access-Control-Expose-Headers': self.expose_headers,
+                'Timing-Allow-Origin': origin}
+
+    def preflight_headers(self, origin, methods):
+        headers = {'Allow': ', '.join((*methods, 'OPTIONS')), 'Vary': 'Origin'}
+        origin = self.allowed_origin(origin)
+        if origin is not None:
+            headers.update({
+                'Access-Control-Allow-Origin': origin,
+                'Access-Control-Allow-Methods': ', '.join((*methods, 'OPTIONS')),
+                'Access-Control-Allow-Headers': self.allow_headers,
+                'Access-Control-Max-Age': self.max_age,
+            })
+        return headers
+
+
+class Preflight:
+    """Answers OPTIONS requests from the URL map alone, without dispatching them.
+
+    The map is bound once, on the first preflight (after every route is
+    registered), and used only to find which methods the path accepts: no
+    view, request hooks or logging run. Unknown paths get a 404.
+    """
+
+    def __init__(self, url_map, policy):
+        self.url_map = url_map
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._adapter = None
+        self._stats = {'answered': 0, 'allowed': 0, 'not_found': 0}
+
+    def methods(self, path):
+        if self._adapter is None:
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = self.url_map.bind('localhost')
+        return sorted(set(self._adapter.allowed_methods(path)) - IMPLICIT_METHODS)
+
+    def __call__(self, environ):
+        """The response to a preflight described by a WSGI environ."""
+        methods = self.methods(environ.get('PATH_INFO') or '/')
+        origin = environ.get('HTTP_ORIGIN')
+        with self._lock:
+            self._stats['answered'] += 1
+            if not methods:
+                self._stats['not_found'] += 1
+            elif self.policy.allowed_origin(origin):
+                self._stats['allowed'] += 1
+        if not methods:
+            return Response(status=404)
+        return Response(status=204, headers=self.policy.preflight_headers(origin, methods))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class PreflightMiddleware:
+    """WSGI middleware that hands OPTIONS requests to a Preflight before the app sees them."""
+
+    def __init__(self, wsgi_app, preflight):
+        self.wsgi_app = wsgi_app
+        self.preflight = preflight
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'OPTIONS':
+            return self.preflight(environ)(environ, start_response)
+        return self.wsgi_app(environ, start_response)
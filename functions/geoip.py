@@ -0,0 +1,157 @@
+"""Country lookup for client IPs from a local, memory-mapped range database.
+
+The database is a flat file of fixed-size records sorted by range start:
+
+    header:  b'GEOIP1\\0\\0' + uint32 record count + 4 reserved bytes
+    record:  16-byte range start + 16-byte range end + 2-byte country code
+
+Addresses are stored as 16 big-endian bytes (IPv4 as IPv4-mapped IPv6), so
+byte order is numeric order and a lookup is a binary search comparing
+slices of the mapping directly. Build one from a CSV of ranges with:
+
+    python functions/geoip.py build country.csv geoip.db
+"""
+import argparse
+import csv
+import functools
+import ipaddress
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b'GEOIP1\0\0'
+HEADER = struct.Struct('>8sI4x')
+RECORD_SIZE = 34
+
+
+def packed(address):
+    """16-byte big-endian form of an IPv4 or IPv6 address."""
+    ip = ipaddress.ip_address(address)
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(b'\0' * 10 + b'\xff\xff' + ip.packed)
+    return ip.packed
+
+
+def client_ip(forwarded_for, remote_addr, trusted_hops=1):
+    """The caller's address given the X-Forwarded-For chain and the socket peer.
+
+    Each trusted proxy appends the address it received the request from, so
+    the client is `trusted_hops` entries from the right. Entries further left
+    are supplied by the client and are ignored. With no trusted proxies, or
+    a chain shorter than expected, the socket peer is used.
+    """
+    hops = [hop.strip() for hop in (forwarded_for or '').split(',') if hop.strip()]
+    if trusted_hops <= 0 or len(hops) < trusted_hops:
+        return remote_addr
+    return hops[-trusted_hops]
+
+
+class GeoIPDatabase:
+    """Binary search over a memory-mapped range database, with a per-IP LRU cache.
+
+    The file is mapped on first lookup and shared read-only by every thread;
+    the OS pages it in on demand, so opening costs nothing up front.
+    """
+
+    def __init__(self, path, cache_size=65536):
+        self.path = path
+        self._lock = threading.Lock()
+        self._map = None
+        self._count = 0
+        self.country = functools.lru_cache(maxsize=cache_size)(self._search)
+
+    def _mapped(self):
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    with open(self.path, 'rb') as file:
+                        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                    magic, count = HEADER.unpack_from(mapped)
+                    if magic != MAGIC or len(mapped) != HEADER.size + count * RECORD_SIZE:
+                        mapped.close()
+                        raise ValueError(f'{self.path} is not a GeoIP range database')
+                    self._count = count
+                    self._map = mapped
+        return self._map
+
+    def _search(self, address):
+        """ISO country code for `address`, or None if it is unparseable or in no range."""
+        try:
+            key = packed(address)
+        except ValueError:
+            return None
+        mapped = self._mapped()
+        # Rightmost record whose start <= key.
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD_SIZE
+            if mapped[offset:offset + 16] <= key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        offset = HEADER.size + (low - 1) * RECORD_SIZE
+        if key > mapped[offset + 16:offset + 32]:
+            return None
+        return mapped[offset + 32:offset + 34].decode('ascii')
+
+    def stats(self):
+        info = self.country.cache_info()
+        return {'records': self._count, 'cache_hits': info.hits, 'cache_misses': info.misses,
+                'cache_size': info.currsize}
+
+
+def read_ranges(csv_path):
+    """(start, end, country) from a CSV with start_ip/end_ip/country or network/country columns."""
+    with open(csv_path, newline='') as file:
+        for row in csv.DictReader(file):
+            country = (row.get('country') or row.get('country_code') or '').strip().upper()
+            if len(country) != 2:
+                continue
+            if row.get('network'):
+                network = ipaddress.ip_network(row['network'].strip(), strict=False)
+                start, end = str(network[0]), str(network[-1])
+            else:
+                start, end = row['start_ip'].strip(), row['end_ip'].strip()
+            yield packed(start), packed(end), country.encode('ascii')
+
+
+def build_database(csv_path, out_path):
+    """Write the sorted binary database for `csv_path`; returns the number of ranges."""
+    ranges = sorted(read_ranges(csv_path))
+    for previous, current in zip(ranges, ranges[1:]):
+        if current[0] <= previous[1]:
+            raise ValueError(f'Overlapping ranges at {ipaddress.ip_address(current[0])}')
+    temp_path = f'{out_path}.tmp'
+    with open(temp_path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(ranges)))
+        for start, end, country in ranges:
+            out.write(start + end + country)
+    os.replace(temp_path, out_path)
+    return len(ranges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query a GeoIP range database.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='convert a CSV of IP ranges')
+    build.add_argument('csv_path')
+    build.add_argument('out_path')
+    lookup = commands.add_parser('lookup', help='look up addresses in a built database')
+    lookup.add_argument('db_path')
+    lookup.add_argument('addresses', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(f'{build_database(args.csv_path, args.out_path)} ranges written to {args.out_path}')
+    else:
+        database = GeoIPDatabase(args.db_path)
+        for address in args.addresses:
+            print(address, database.country(address))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+
+
+def _path(*keys):
+    def extract(row):
+        for key in keys:
+            if not isinstance(row, dict):
+                return None
+            row = row.get(key)
+        return row
+    return extract
+
+
+def _account_currencies(row):
+    details = row.get('accountDetails') or {}
+    symbols = [balance.get('tokenSymbol') for balance in details.get('balances') or []]
+    symbols.append((details.get('depositAccount') or {}).get('currency'))
+    return [symbol for symbol in symbols if symbol]
+
+
+def _payout_currencies(row):
+    symbols = []
+    for item in row.get('payouts') or []:
+        symbols.append((item.get('amount') or {}).get('tokenSymbol'))
+        symbols.append(((item.get('details') or {}).get('fiatAndRailDetails') or {}).get('symbol'))
+    return [symbol for symbol in symbols if symbol]
+
+
+def _payout_amount(row):
+    return sum((item.get('amount') or {}).get('tokenAmount') or 0 for item in row.get('payouts') or [])
+
+
+# Queryable fields per grid: field name -> extractor. `status` and `currency`
+# are the filterable fields; extractors may return a list for multi-valued fields.
+SCHEMAS = {
+    'organization': {
+        'id': _path('id'),
+        'name': _path('name'),
+        'type': _path('type'),
+        'status': _path('kycStatus', 'type'),
+        'tosStatus': _path('tosStatus'),
+        'currency': lambda row: [c.get('currencyCode') for c in row.get('currencyCapabilities') or []
+                                 if c.get('currencyCode')],
+        'createdAt': _path('createdAt'),
+        'updatedAt': _path('updatedAt'),
+    },
+    'account': {
+        'id': _path('id'),
+        'name': _path('name'),
+        'status': _path('status'),
+        'currency': _account_currencies,
+        'organization': _path('organization', 'id'),
+        'organizationName': _path('organization', 'name'),
+        'createdAt': _path('createdAt'),
+        'updatedAt': _path('updatedAt'),
+    },
+    'payout': {
+        'id': _path('id'),
+        'status': _path('status'),
+        'currency': _payout_currencies,
+        'amount': _payout_amount,
+        'memo': _path('memo'),
+        'sourceAccountId': _path('sourceAccountId'),
+        'createdAt': _path('createdAt'),
+        'updatedAt': _path('updatedAt'),
+    },
+}
+
+FILTER_FIELDS = ('status', 'currency')
+DATE_FIELDS = ('createdAt', 'updatedAt')
+GROUP_FIELDS = ('status', 'organization')
+
+# Query parameters that switch a list route from its plain response to a grid query.
+GRID_PARAMS = frozenset(('status', 'currency', 'from', 'to', 'dateField', 'sort', 'groupBy', 'offset'))
+
+
+class GridQueryError(ValueError):
+    """A grid query parameter is malformed or names an unknown field."""
+
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 timestamp or date; naive values are taken as UTC."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _first(value):
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+class GridIndex:
+    """Per-field columns and posting lists over one list of rows.
+
+    Columns (the extracted value of a field for every row, which double as
+    precomputed sort keys) and postings (filter value -> row positions) are
+    built the first time a query needs them and reused by later queries on
+    the same rows. Rows are never copied or modified.
+    """
+
+    def __init__(self, rows, schema):
+        self.rows = rows
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._postings = {}
+
+    def column(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            extract = self.schema[field]
+            if field in DATE_FIELDS:
+                column = [self._timestamp(extract(row)) for row in self.rows]
+            else:
+                column = [extract(row) for row in self.rows]
+            with self._lock:
+                column = self._columns.setdefault(field, column)
+        return column
+
+    @staticmethod
+    def _timestamp(value):
+        try:
+            return parse_timestamp(value) if value else None
+        except (TypeError, ValueError):
+            return None
+
+    def postings(self, field):
+        postings = self._postings.get(field)
+        if postings is None:
+            postings = {}
+            for position, value in enumerate(self.column(field)):
+                for item in value if isinstance(value, list) else [value]:
+                    if item is not None:
+                        postings.setdefault(str(item).upper(), set()).add(position)
+            with self._lock:
+                postings = self._postings.setdefault(field, postings)
+        return postings
+
+    def sort_key(self, field):
+        column = self.column(field)
+        return lambda position: _first(column[position])
+
+
+class GridQuery:
+    """Filter, sort, group and page one list of rows.
+
+    Built from request query parameters by `parse`:
+
+    - `status`, `currency`: comma-separated values, matched case-insensitively
+    - `from`, `to`: ISO-8601 bounds on `dateField` (createdAt by default); a
+      date-only `to` includes that whole day
+    - `sort`: comma-separated fields, `-` prefix for descending; rows with no
+      value sort last
+    - `groupBy`: `status` or `organization`
+    - `limit`, `offset`: the window of matching rows to return
+    """
+
+    def __init__(self, schema, filters=None, date_field='createdAt', start=None, end=None,
+                 sort=(), group_by=None, limit=None, offset=0):
+        self.schema = schema
+        self.filters = filters or {}
+        self.date_field = date_field
+        self.start = start
+        self.end = end
+        self.sort = list(sort)
+        self.group_by = group_by
+        self.limit = limit
+        self.offset = offset
+
+    @classmethod
+    def parse(cls, args, schema, default_limit, max_limit):
+        def values(name):
+            raw = args.get(name)
+            return [value.strip() for value in raw.split(',') if value.strip()] if raw else []
+
+        filters = {field: {value.upper() for value in values(field)}
+                   for field in FILTER_FIELDS if values(field)}
+        for field in filters:
+            if field not in schema:
+                raise GridQueryError(f'Cannot filter on {field} here')
+
+        date_field = args.get('dateField', 'createdAt')
+        if date_field not in DATE_FIELDS:
+            raise GridQueryError(f'dateField must be one of {", ".join(DATE_FIELDS)}')
+        start = end = None
+        try:
+            if args.get('from'):
+                start = parse_timestamp(args['from'])
+            if args.get('to'):
+                end = parse_timestamp(args['to'])
+                if 'T' not in args['to']:
+                    end += timedelta(days=1)
+                else:
+                    end += timedelta(microseconds=1)
+        except ValueError as e:
+            raise GridQueryError(f'from and to must be ISO-8601 dates: {e}') from e
+
+        sort = []
+        for key in values('sort'):
+            field = key.lstrip('-+')
+            if field not in schema:
+                raise GridQueryError(f'Cannot sort on {field}; expected one of {", ".join(schema)}')
+            sort.append((field, key.startswith('-')))
+
+        group_by = args.get('groupBy') or None
+        if group_by is not None and (group_by not in GROUP_FIELDS or group_by not in schema):
+            raise GridQueryError(f'Cannot group by {group_by} here')
+
+        limit = cls._int(args, 'limit', default_limit, 1, max_limit)
+        offset = cls._int(args, 'offset', 0, 0, None)
+        return cls(schema, filters, date_field, start, end, sort, group_by, limit, offset)
+
+    @staticmethod
+    def _int(args, name, default, minimum, maximum):
+        raw = args.get(name)
+        if raw is None or raw == '':
+            return default
+        try:
+            value = int(raw)
+        except ValueError:
+            raise GridQueryError(f'{name} must be an integer') from None
+        value = max(value, minimum)
+        return min(value, maximum) if maximum is not None else value
+
+    def matches(self, index):
+        """Positions of the rows that pass every filter, in list order."""
+        candidates = None
+        for field, wanted in self.filters.items():
+            postings = index.postings(field)
+            matched = set().union(*(postings.get(value, ()) for value in wanted))
+            candidates = matched if candidates is None else candidates & matched
+        positions = sorted(candidates) if candidates is not None else range(len(index.rows))
+
+        if self.start is not None or self.end is not None:
+            dates = index.column(self.date_field)
+            positions = [position for position in positions
+                         if dates[position] is not None
+                         and (self.start is None or dates[position] >= self.start)
+                         and (self.end is None or dates[position] < self.end)]
+        return list(positions)
+
+    def order(self, index, positions):
+        # One stable sort per key, least significant first; the group key, if
+        # any, is the most significant so each group's rows are contiguous.
+        keys = [*([(self.group_by, False)] if self.group_by else []), *self.sort]
+        for field, descending in reversed(keys):
+            key = index.sort_key(field)
+            if descending:
+                positions.sort(key=lambda position: (key(position) is not None, key(position)),
+                               reverse=True)
+            else:
+                positions.sort(key=lambda position: (key(position) is None, key(position)))
+        return positions
+
+    def run(self, index):
+        """Returns (result, total): the page of rows, or of groups, and the number of matches.
+
+        Grouped results are `[{"key", "count", "rows"}]` for the groups with
+        rows on this page; `count` is the group's size across all matches.
+        """
+        positions = self.order(index, self.matches(index))
+        window = positions[self.offset:self.offset + self.limit if self.limit else None]
+        if not self.group_by:
+            return [index.rows[position] for position in window], len(positions)
+
+        key = index.sort_key(self.group_by)
+        counts = Counter(key(position) for position in positions)
+        groups = []
+        for position in window:
+            group_key = key(position)
+            if not groups or groups[-1]['key'] != group_key:
+                groups.append({'key': group_key, 'count': counts[group_key], 'rows': []})
+            groups[-1]['rows'].append(index.rows[position])
+        return groups, len(positions)
+
+
+class GridIndexCache:
+    """Keeps the GridIndex of recently queried row lists.
+
+    Entries are keyed by the caller's cache key and only reused while the
+    caller passes the very same list object, so an index lives exactly as
+    long as the cached read it was built over.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'builds': 0}
+
+    def get(self, key, rows, schema):
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None and index.rows is rows:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return index
+            index = self._entries[key] = GridIndex(rows, schema)
+            self._entries.move_to_end(key)
+            self._stats['builds'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return index
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries)}
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdempotencyConflictError(Exception):
+    """The idempotency key belongs to a write that is running or whose outcome is unknown."""
+
+
+class IdempotencyMismatchError(Exception):
+    """The idempotency key was already used for a different payload."""
+
+
+class _Entry:
+    __slots__ = ('state', 'fingerprint', 'result', 'error', 'expires_at')
+
+    def __init__(self, state, fingerprint, expires_at):
+        self.state = state
+        self.fingerprint = fingerprint
+        self.result = None
+        self.error = None
+        self.expires_at = expires_at
+
+
+class IdempotencyLedger:
+    """Per-instance record of payout writes by idempotency key.
+
+    `claim` either reserves a key for the caller (returns None) or returns the
+    existing entry: PENDING while another caller is running it, DONE with the
+    recorded result, or UNKNOWN when it failed in a way that may still have
+    reached MuralPay. Entries keep the fingerprint of the payload they were
+    claimed for, so a key reused for a different payload can be refused
+    instead of replayed. UNKNOWN keys stay blocked so a retry can never pay twice;
+    writes that certainly did not happen are `release`d so they can be retried.
+    Entries expire after `ttl` seconds and the oldest are dropped past
+    `max_entries`.
+    """
+
+    PENDING = 'pending'
+    DONE = 'done'
+    UNKNOWN = 'unknown'
+
+    def __init__(self, ttl=86400.0, max_entries=100_000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'claimed': 0, 'replayed': 0, 'conflicts': 0, 'mismatches': 0, 'released': 0,
+                       'unknown': 0}
+
+    def claim(self, key, fingerprint=None):
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires_at:
+                if entry.fingerprint != fingerprint:
+                    self._stats['mismatches'] += 1
+                else:
+                    self._stats['replayed' if entry.state == self.DONE else 'conflicts'] += 1
+                return entry
+            self._entries[key] = _Entry(self.PENDING, fingerprint, now + self.ttl)
+            self._entries.move_to_end(key)
+            self._stats['claimed'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return None
+
+    def complete(self, key, result):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.state = self.DONE
+                entry.result = result
+
+    def mark_unknown(self, key, error):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.state = self.UNKNOWN
+                entry.error = error
+                self._stats['unknown'] += 1
+
+    def release(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._stats['released'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries)}
@@ -1,75 +1,254 @@
+import base64
+import hashlib
+import hmac
+import itertools
 import json
 import logging
+import math
+import os
 import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 
 import requests
-from firebase_admin import initialize_app, get_app
 from firebase_functions import https_fn
-from flask import Flask, request, jsonify, g
-from flask_cors import CORS
-from google.cloud import secretmanager
-
-
-# Configure logging with structured format
-class StructuredLogger:
-    def __init__(self, logger):
-        self.logger = logger
-
-    def _log(self, level, msg, **kwargs):
-        log_data = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'message': msg,
-            'correlation_id': getattr(g, 'correlation_id', 'N/A'),
-            **kwargs
-        }
-        getattr(self.logger, level)(json.dumps(log_data))
-
-    def info(self, msg, **kwargs):
-        self._log('info', msg, **kwargs)
-
-    def error(self, msg, **kwargs):
-        self._log('error', msg, **kwargs)
-
-    def debug(self, msg, **kwargs):
-        self._log('debug', msg, **kwargs)
-
-    def warning(self, msg, **kwargs):
-        self._log('warning', msg, **kwargs)
+from flask import (Flask, request, jsonify, g, copy_current_request_context, has_request_context,
+                   stream_with_context)
+from flask.json.provider import DefaultJSONProvider
+
+from secret_cache import SecretCache
+import serialization
+from compression import ResponseCompressor
+from cors import CorsPolicy, Preflight, PreflightMiddleware
+from geoip import GeoIPDatabase, client_ip
+from grid_query import GRID_PARAMS, SCHEMAS, GridIndex, GridIndexCache, GridQuery, GridQueryError
+from idempotency import IdempotencyConflictError, IdempotencyLedger, IdempotencyMismatchError
+from profiling import RequestProfiler
+from structured_logging import StructuredLogger
+from tracing import CORRELATION_HEADER, server_timing, span
+from coalesce import SingleFlight, request_key
+from resilience import (CircuitBreakerRegistry, CircuitOpenError, ConcurrencyLimiter, RateLimitedError,
+                        RetryPolicy, UpstreamRateLimiter)
+from response_cache import ResponseCache
+from snapshot_store import SnapshotStore, scope_key
+from upstream import UpstreamClient
 
 
 # Configure base logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 base_logger = logging.getLogger(__name__)
-logger = StructuredLogger(base_logger)
+logger = StructuredLogger(
+    base_logger,
+    max_field_bytes=int(os.environ.get('LOG_MAX_FIELD_BYTES', 4096)),
+    payload_sample_rate=float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 0.1)))
+
+
+class TracedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by the serialization module, timed as a span."""
+
+    def dumps(self, obj, **kwargs):
+        with span('json.encode'):
+            return serialization.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return serialization.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with span('json.encode'):
+            body = serialization.dumps_bytes(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
 
-try:
-    get_app()
-except ValueError:
-    initialize_app()
 
 app = Flask(__name__)
-CORS(app, resources={r"/organizations*": {"origins": "*"}})
-base_url = 'https://api-staging.muralpay.com/api'
+app.json = TracedJSONProvider(app)
+base_url = os.environ.get('MURALPAY_BASE_URL', 'https://api-staging.muralpay.com/api')
+upstream = UpstreamClient(
+    base_url,
+    pool_maxsize=int(os.environ.get('UPSTREAM_POOL_MAXSIZE', 32)),
+    retry_policy=RetryPolicy(attempts=int(os.environ.get('UPSTREAM_RETRY_ATTEMPTS', 3)),
+                             base_delay=float(os.environ.get('UPSTREAM_RETRY_BASE_DELAY', 0.1)),
+                             max_delay=float(os.environ.get('UPSTREAM_RETRY_MAX_DELAY', 2.0))),
+    breakers=CircuitBreakerRegistry(
+        failure_threshold=int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5)),
+        reset_timeout=float(os.environ.get('CIRCUIT_RESET_TIMEOUT_SECONDS', 30))),
+    # Requests per second to MuralPay, in total and per on-behalf-of org (for at
+    # most UPSTREAM_RATE_LIMIT_MAX_ORGS recently seen orgs); calls wait up to
+    # UPSTREAM_RATE_LIMIT_MAX_WAIT_SECONDS for a token, then fail with a 429.
+    # The wait has to outlast a spent quota window, or a fan-out larger than
+    # one window's quota fails every call after the quota runs out.
+    rate_limiter=UpstreamRateLimiter(
+        rate=float(os.environ.get('UPSTREAM_RATE_LIMIT', 100)),
+        burst=int(os.environ.get('UPSTREAM_RATE_BURST', 100)),
+        org_rate=float(os.environ.get('UPSTREAM_ORG_RATE_LIMIT', 25)),
+        org_burst=int(os.environ.get('UPSTREAM_ORG_RATE_BURST', 25)),
+        max_wait=float(os.environ.get('UPSTREAM_RATE_LIMIT_MAX_WAIT_SECONDS', 5.0)),
+        max_orgs=int(os.environ.get('UPSTREAM_RATE_LIMIT_MAX_ORGS', 1024))))
+response_compressor = ResponseCompressor(
+    min_bytes=int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', 1024)),
+    gzip_level=int(os.environ.get('RESPONSE_GZIP_LEVEL', 6)),
+    brotli_quality=int(os.environ.get('RESPONSE_BROTLI_QUALITY', 4)))
+response_cache = ResponseCache(
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 8 * 1024 * 1024)),
+    stale_ttl=float(os.environ.get('RESPONSE_CACHE_STALE_SECONDS', 600)))
+
+# Generated TOS/KYC links, reused until they age out or the org's status
+# changes (the status is part of the key). MuralPay does not say how long a
+# link stays valid, so keep LINK_CACHE_TTL_SECONDS below its validity window.
+link_cache_ttl = float(os.environ.get('LINK_CACHE_TTL_SECONDS', 300))
+link_cache = ResponseCache(
+    max_bytes=int(os.environ.get('LINK_CACHE_MAX_BYTES', 1024 * 1024)),
+    ttls={'tos_link': link_cache_ttl, 'kyc_link': link_cache_ttl})
+
+# Identical concurrent reads share one upstream call.
+coalescer = SingleFlight()
+
+# Requests beyond this many in flight are shed with a 503 instead of queuing.
+request_limiter = ConcurrencyLimiter(int(os.environ.get('MAX_CONCURRENT_REQUESTS', 64)))
+shed_retry_after = int(os.environ.get('SHED_RETRY_AFTER_SECONDS', 1))
+
+# Shared pool for upstream fan-out (TOS/KYC enrichment, per-org account lists);
+# bounds per-instance concurrency.
+fanout_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('UPSTREAM_FANOUT_CONCURRENCY', 8)),
+    thread_name_prefix='upstream-fanout')
+org_enrichment_timeout = float(os.environ.get('ORG_ENRICHMENT_TIMEOUT_SECONDS', 10))
+
+# Sub-requests of POST /api/batch run on their own pool: they fan out onto
+# fanout_pool themselves, and sharing it could leave every worker waiting.
+batch_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('BATCH_CONCURRENCY', 4)),
+    thread_name_prefix='batch')
+batch_max_requests = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+
+# Bulk payout create/execute: upstream writes in flight per instance, items
+# per call, and how long a completed write is remembered by idempotency key.
+bulk_payout_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('BULK_PAYOUT_CONCURRENCY', 4)),
+    thread_name_prefix='bulk-payout')
+bulk_payout_max_items = int(os.environ.get('BULK_PAYOUT_MAX_ITEMS', 500))
+idempotency_ledger = IdempotencyLedger(ttl=float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400)))
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# Opt-in request profiling. Requests whose PROFILE_HEADER matches PROFILE_TOKEN,
+# and a PROFILE_SAMPLE_RATE fraction of all requests, have their stacks sampled
+# every PROFILE_INTERVAL_MS (and allocations traced, unless
+# PROFILE_TRACE_ALLOCATIONS is false). Each logs a 'Request profile' line; the
+# per-route hot-path report is at /debug/profile, for the same token only.
+# PROFILE_HEADER is in the CORS allow-list, so the SPA can send it too.
+profile_token = os.environ.get('PROFILE_TOKEN') or None
+profiler = RequestProfiler(
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000,
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    trace_allocations=os.environ.get('PROFILE_TRACE_ALLOCATIONS', 'true').lower() == 'true')
+PROFILE_HEADER = 'X-Profile-Token'
+
+# CORS: origins allowed to call the API from a browser, and how long a browser
+# may reuse a preflight. Preflights (OPTIONS) are answered from the URL map
+# before routing, request hooks or logging, by PreflightMiddleware for WSGI
+# servers and by main_function for Cloud Functions.
+cors_policy = CorsPolicy(
+    [origin.strip() for origin in os.environ.get(
+        'CORS_ALLOWED_ORIGINS',
+        'https://mural-take-home-e3b8b.web.app,https://mural-take-home-e3b8b.firebaseapp.com,'
+        'http://localhost:4200').split(',') if origin.strip()],
+    allow_headers=('Content-Type', 'Authorization', CORRELATION_HEADER, IDEMPOTENCY_HEADER,
+                   PROFILE_HEADER),
+    expose_headers=('X-Next-Id', 'X-Total-Count', CORRELATION_HEADER, 'Server-Timing'),
+    max_age=int(os.environ.get('CORS_MAX_AGE_SECONDS', 86400)))
+preflight = Preflight(app.url_map, cors_policy)
+app.wsgi_app = PreflightMiddleware(app.wsgi_app, preflight)
+
+# Server-side restricted-country check on payout writes. GEOIP_DB_PATH points
+# at a range database built with geoip.py; without one nothing is blocked.
+# TRUSTED_PROXY_HOPS is how many proxies in front of the function append to
+# X-Forwarded-For.
+geoip_db = GeoIPDatabase(os.environ['GEOIP_DB_PATH']) if os.environ.get('GEOIP_DB_PATH') else None
+restricted_countries = frozenset(code.strip().upper()
+                                 for code in os.environ.get('RESTRICTED_COUNTRIES', 'RU,KP').split(',')
+                                 if code.strip())
+trusted_proxy_hops = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+GEO_RESTRICTED_ENDPOINTS = frozenset(('create_payout_requests', 'execute_payout_requests',
+                                      'create_payout_requests_bulk', 'execute_payout_requests_bulk'))
+
+# Payout search paging: rows returned to the SPA per call, and upstream page size/budget.
+payout_page_limit = int(os.environ.get('PAYOUT_PAGE_LIMIT', 50))
+payout_page_max_limit = int(os.environ.get('PAYOUT_PAGE_MAX_LIMIT', 500))
+payout_search_page_size = int(os.environ.get('PAYOUT_SEARCH_PAGE_SIZE', 100))
+payout_search_max_pages = int(os.environ.get('PAYOUT_SEARCH_MAX_PAGES', 20))
+
+# Optional local snapshot of organizations, accounts and payouts. When
+# SNAPSHOT_STORE_PATH is set, list reads and status-filtered payout searches
+# are answered from SQLite. A scope older than SNAPSHOT_MAX_STALENESS_SECONDS
+# is re-synced from MuralPay in the background while reads keep using it;
+# past SNAPSHOT_MAX_SERVE_STALENESS_SECONDS reads wait for the sync.
+snapshot_store = None
+if os.environ.get('SNAPSHOT_STORE_PATH'):
+    snapshot_store = SnapshotStore(
+        os.environ['SNAPSHOT_STORE_PATH'],
+        max_staleness=float(os.environ.get('SNAPSHOT_MAX_STALENESS_SECONDS', 60)),
+        max_serve_staleness=float(os.environ.get('SNAPSHOT_MAX_SERVE_STALENESS_SECONDS', 600)))
+snapshot_max_payout_pages = int(os.environ.get('SNAPSHOT_MAX_PAYOUT_PAGES', 1000))
+PAYOUT_STATUSES = ('AWAITING_EXECUTION', 'PENDING', 'EXECUTED', 'FAILED', 'CANCELED')
+SNAPSHOT_CURSOR = 'snapshot'
+
+# Server-side grid queries (?status=&currency=&from=&to=&sort=&groupBy=&offset=)
+# on the list routes: rows per page by default and at most, and how many row
+# lists keep their filter/sort index between queries.
+grid_page_limit = int(os.environ.get('GRID_PAGE_LIMIT', 100))
+grid_max_limit = int(os.environ.get('GRID_MAX_LIMIT', 1000))
+grid_indexes = GridIndexCache(int(os.environ.get('GRID_INDEX_CACHE_ENTRIES', 64)))
+
+# `g` entries the request's own thread releases in its teardown. Worker
+# threads must not copy them: their contexts run the teardown hooks too.
+REQUEST_OWNED_G_KEYS = frozenset(('holds_request_slot', 'profile'))
+
+
+def with_request_context(fn):
+    """Carry the current request context and `g` values into a worker thread.
+
+    copy_current_request_context pushes a fresh app context in the worker, so
+    `g` (correlation id and friends) is copied across explicitly. The
+    request's concurrency slot and profile are left behind: the worker's
+    context runs the teardown hooks when it exits, and must not release the
+    slot or finish the profile early. A profiled request's workers are
+    sampled as part of its profile instead.
+    """
+    if not has_request_context():
+        return fn
+    values = {key: value for key, value in g.__dict__.items() if key not in REQUEST_OWNED_G_KEYS}
+    profile = g.get('profile')
+
+    @copy_current_request_context
+    def wrapper(*args, **kwargs):
+        g.__dict__.update(values)
+        with profiler.attach(profile):
+            return fn(*args, **kwargs)
+
+    return wrapper
 
 
 def log_request_info():
     """Log detailed request information"""
-    g.correlation_id = str(uuid.uuid4())
+    g.correlation_id = request.headers.get(CORRELATION_HEADER) or str(uuid.uuid4())
     g.start_time = time.time()
-
-    request_data = {
-        'method': request.method,
-        'path': request.path,
-        'headers': dict(request.headers),
-        'query_params': dict(request.args),
-        'body': request.get_json(silent=True)
-    }
+    g.trace = []
+    g.log_payload = logger.sample_payload()
+
+    def request_data():
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'query_params': dict(request.args)
+        }
+        if g.log_payload:
+            data['headers'] = dict(request.headers)
+            data['body'] = request.get_json(silent=True)
+        return data
 
     logger.info('Incoming request', request_data=request_data)
 
@@ -88,28 +267,123 @@ def log_response_info(response):
     return response
 
 
+def profile_authorized():
+    """Whether the request carries the profiling token."""
+    token = request.headers.get(PROFILE_HEADER)
+    return bool(profile_token and token and hmac.compare_digest(token, profile_token))
+
+
+def finish_profile(session, spans, correlation_id):
+    logger.info('Request profile',
+                correlation_id=correlation_id,
+                **profiler.finish(session, spans))
+
+
 @app.before_request
 def before_request():
     log_request_info()
+    if request.endpoint != 'get_profile_report' and (profile_authorized() or profiler.sampled()):
+        g.profile = profiler.start(request.endpoint or 'unmatched')
+    if not request_limiter.try_acquire():
+        logger.warning('Shedding request, instance at capacity',
+                       limiter=request_limiter.stats())
+        response = jsonify({"error": "Server is at capacity, retry shortly"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(shed_retry_after)
+        return response
+    g.holds_request_slot = True
+    return None
+
+
+@app.before_request
+def enforce_restricted_countries():
+    if geoip_db is None:
+        return None
+    if request.endpoint == 'batch':
+        # Resolved from the batch request itself; run_batch_item checks each item.
+        request_geo()
+        return None
+    if request.endpoint in GEO_RESTRICTED_ENDPOINTS:
+        return geo_restricted_response()
+    return None
+
+
+@app.teardown_request
+def release_request_slot(exc):
+    if g.pop('holds_request_slot', False):
+        request_limiter.release()
+
+
+@app.teardown_request
+def finish_request_profile(exc):
+    session = g.pop('profile', None)
+    if session is not None:
+        finish_profile(session, g.get('trace'), g.get('correlation_id'))
+
+
+def compress_response(response):
+    """Compress a buffered body in place when the client accepts gzip or brotli."""
+    if (response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.status_code in (204, 304) or response.status_code < 200):
+        return
+    data = response.get_data()
+    if not response_compressor.eligible(len(data), response.mimetype):
+        return
+    response.vary.add('Accept-Encoding')
+    encoding = response_compressor.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return
+    with span('compress', encoding=encoding, size_bytes=len(data)):
+        response.set_data(response_compressor.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # The strong ETag named the uncompressed bytes; If-None-Match compares weakly.
+        response.set_etag(etag, weak=True)
 
 
 @app.after_request
 def after_request_combined(response):
     try:
+        compress_response(response)
+
         # Log response info
         duration = time.time() - g.start_time
-        response_data = {
-            'status_code': response.status_code,
-            'headers': dict(response.headers),
-            'duration_ms': round(duration * 1000, 2)
-        }
-        logger.info('Outgoing response', response_data=response_data)
 
-        # Apply CORS headers
-        response.headers['Access-Control-Allow-Origin'] = request.headers.get(
-            'Origin', 'https://mural-take-home-e3b8b.web.app')
-        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        def response_data():
+            data = {
+                'status_code': response.status_code,
+                'duration_ms': round(duration * 1000, 2)
+            }
+            if g.get('log_payload'):
+                data['headers'] = dict(response.headers)
+            return data
+
+        if g.get('served_stale'):
+            response.headers['Warning'] = '110 - "Response is Stale"'
+        response.headers['Server-Timing'] = server_timing(g.get('trace'), duration * 1000)
+        response.headers[CORRELATION_HEADER] = g.correlation_id
+        logger.info('Outgoing response',
+                    response_data=response_data,
+                    spans=lambda: [record.as_dict() for record in g.get('trace', [])])
+        logger.debug('Instance stats',
+                     upstream_pool=upstream.stats,
+                     request_limiter=request_limiter.stats,
+                     coalescing=coalescer.stats,
+                     response_cache=response_cache.stats,
+                     link_cache=link_cache.stats,
+                     idempotency=idempotency_ledger.stats,
+                     geoip=geoip_db and geoip_db.stats,
+                     preflight=preflight.stats,
+                     compression=response_compressor.stats,
+                     snapshot=snapshot_store and snapshot_store.stats,
+                     grid_indexes=grid_indexes.stats,
+                     profiler=profiler.stats,
+                     logging=logger.stats)
+
+        response.vary.add('Origin')
+        response.headers.update(cors_policy.response_headers(request.headers.get('Origin')))
 
         return response
     except Exception as e:
@@ -119,16 +393,254 @@ def after_request_combined(response):
         return response
 
 
+class BadRequestError(Exception):
+    """Raised for malformed client input; routes answer it with a 400."""
+
+
+def parse_int(name, raw, default, minimum, maximum):
+    """An integer query parameter's raw value, clamped to [minimum, maximum]."""
+    if raw is None:
+        return default
+    try:
+        return min(max(int(raw), minimum), maximum)
+    except ValueError:
+        raise BadRequestError(f'Query parameter {name} must be an integer')
+
+
+def query_int(name, default, minimum, maximum):
+    """Read an integer query parameter, clamped to [minimum, maximum]."""
+    return parse_int(name, request.args.get(name), default, minimum, maximum)
+
+
+def cacheable_json(data, status):
+    """jsonify with an ETag so browsers can revalidate with If-None-Match."""
+    response = jsonify(data)
+    response.status_code = status
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def wants_grid():
+    """True when the query string asks a list route for a grid query."""
+    return any(name in request.args for name in GRID_PARAMS)
+
+
+def grid_response(grid, rows, index_key=None):
+    """Filter, sort, group and page `rows` by the request's grid parameters.
+
+    The matching row count goes out as X-Total-Count. Passing `index_key`
+    keeps the rows' index for the next query while the same list is served.
+    """
+    schema = SCHEMAS[grid]
+    try:
+        query = GridQuery.parse(request.args, schema, grid_page_limit, grid_max_limit)
+    except GridQueryError as e:
+        raise BadRequestError(str(e)) from e
+    index = grid_indexes.get(index_key, rows, schema) if index_key else GridIndex(rows, schema)
+    with span('grid.query', grid=grid, rows=len(rows)) as record:
+        result, total = query.run(index)
+        record.attributes['total'] = total
+    response = cacheable_json(result, 200)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson():
+    """True when the client asked for a streamed NDJSON body over plain JSON."""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(rows, headers=None):
+    """Stream `rows` as newline-delimited JSON, one record per line, as they are produced.
+
+    Nothing is buffered beyond the current record. The status line has
+    already gone out when rows start failing, so an error part-way through
+    is reported as a final `{"error": ...}` record instead of a 500.
+    """
+    def generate():
+        started = time.time()
+        count = 0
+        try:
+            for row in rows:
+                yield serialization.dumps(row) + '\n'
+                count += 1
+        except Exception as e:
+            logger.error('Error while streaming response',
+                         rows_sent=count,
+                         error=str(e),
+                         error_type=type(e).__name__)
+            yield serialization.dumps({"error": str(e)}) + '\n'
+        logger.info('Stream finished',
+                    path=request.path,
+                    rows_sent=count,
+                    duration_ms=round((time.time() - started) * 1000, 2))
+
+    response = app.response_class(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE,
+                                  headers=headers)
+    response.headers['Cache-Control'] = 'no-store'
+    if g.pop('holds_request_slot', False):
+        # The request keeps its concurrency slot until the body is sent, not
+        # just until the view returns.
+        response.call_on_close(request_limiter.release)
+    session = g.pop('profile', None)
+    if session is not None:
+        # Likewise, the profile covers producing the whole body.
+        trace, correlation_id = g.get('trace'), g.get('correlation_id')
+        response.call_on_close(lambda: finish_profile(session, trace, correlation_id))
+    return response
+
+
+def lookup_geo(forwarded_for, remote_addr):
+    """(client IP, country code or None) for a request's X-Forwarded-For and peer address."""
+    ip = client_ip(forwarded_for, remote_addr, trusted_proxy_hops)
+    if geoip_db is None or not ip:
+        return ip, None
+    with span('geoip'):
+        return ip, geoip_db.country(ip)
+
+
+def request_geo():
+    """(client IP, country code or None) for the current request, resolved once."""
+    if 'client_country' not in g:
+        g.client_ip, g.client_country = lookup_geo(request.headers.get('X-Forwarded-For'),
+                                                   request.remote_addr)
+    return g.client_ip, g.client_country
+
+
+def restricted_country_error(ip, country, path):
+    """The 451 error message if `country` is restricted, else None."""
+    if country not in restricted_countries:
+        return None
+    logger.warning('Blocked request from restricted country',
+                   client_ip=ip,
+                   country=country,
+                   path=path)
+    return f"Payouts are not available from {country}"
+
+
+def geo_restricted_response():
+    """A 451 response if the caller is in a restricted country, else None."""
+    error = restricted_country_error(*request_geo(), request.path)
+    if error is None:
+        return None
+    response = jsonify({"error": error})
+    response.status_code = 451
+    return response
+
+
+def error_status(e):
+    """(status code, headers) for an exception raised while serving a route."""
+    if isinstance(e, CircuitOpenError):
+        return 503, {'Retry-After': str(math.ceil(e.retry_after))}
+    if isinstance(e, RateLimitedError):
+        return 429, {'Retry-After': str(math.ceil(e.retry_after))}
+    upstream_response = getattr(e, 'response', None)
+    if getattr(upstream_response, 'status_code', None) == 429:
+        # MuralPay kept throttling through the retries; pass its answer on.
+        retry_after = upstream_response.headers.get('Retry-After')
+        return 429, {'Retry-After': retry_after} if retry_after else {}
+    return 500, {}
+
+
+def error_response(e):
+    """Map an exception raised while serving a route to an error response."""
+    status, headers = error_status(e)
+    response = jsonify({"error": str(e)})
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+def is_upstream_unavailable(e):
+    """True for failures that say MuralPay is down rather than that the request was bad."""
+    if isinstance(e, (CircuitOpenError, RateLimitedError, requests.exceptions.ConnectionError,
+                      requests.exceptions.Timeout)):
+        return True
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    return status is not None and (status >= 500 or status == 429)
+
+
+def stale_fallback(key, e, is_unavailable=is_upstream_unavailable):
+    """The expired cache entry to serve instead of raising `e`, or None.
+
+    Only outages qualify; a request MuralPay rejected is not papered over.
+    """
+    if not is_unavailable(e):
+        return None
+    stale = response_cache.get_stale(key)
+    if stale is not None:
+        logger.warning('Serving stale cached response',
+                       cache_key=list(key),
+                       error=str(e),
+                       error_type=type(e).__name__)
+    return stale
+
+
+def cached_read(key, loader):
+    """Read through the response cache, serving stale data if upstream is down."""
+    try:
+        return response_cache.get_or_load(key, loader)
+    except Exception as e:
+        stale = stale_fallback(key, e)
+        if stale is None:
+            raise
+        if has_request_context():
+            g.served_stale = True
+        return stale
+
+
+def snapshot_read(kind, org_id, fetch, read):
+    """Answer `read()` from the snapshot store, syncing the scope from `fetch()` if stale.
+
+    If the sync fails because MuralPay is down, an older snapshot is served
+    and marked stale, like `cached_read` does.
+    """
+    scope = scope_key(kind, org_id)
+    try:
+        snapshot_store.ensure_fresh(kind, org_id, fetch)
+    except Exception as e:
+        if not is_upstream_unavailable(e) or snapshot_store.synced_at(scope) is None:
+            raise
+        logger.warning('Serving stale snapshot',
+                       scope=scope,
+                       error=str(e),
+                       error_type=type(e).__name__)
+        if has_request_context():
+            g.served_stale = True
+    with span('snapshot.read', scope=scope):
+        return read()
+
+
+def expire_snapshot(kind, org_id=None):
+    if snapshot_store is not None:
+        snapshot_store.expire(kind, org_id)
+
+
 # --- Secret Helper ---
+def secret_manager_client():
+    # Imported on first use rather than at module load, so a cold start does
+    # not pay for it before the first request.
+    from google.cloud import secretmanager
+
+    return secretmanager.SecretManagerServiceClient()
+
+
+secret_cache = SecretCache(
+    client_factory=secret_manager_client,
+    project_id='mural-take-home-e3b8b',
+    default_ttl=float(os.environ.get('SECRET_CACHE_TTL_SECONDS', 300)),
+    refresh_ahead=float(os.environ.get('SECRET_REFRESH_AHEAD_SECONDS', 60)))
+
+
 def get_secret(secret_id: str) -> str:
-    logger.info('Fetching secret', secret_id=secret_id)
+    logger.debug('Fetching secret', secret_id=secret_id)
     try:
-        client = secretmanager.SecretManagerServiceClient()
-        project_id = 'mural-take-home-e3b8b'
-        name = f'projects/{project_id}/secrets/{secret_id}/versions/latest'
-        response = client.access_secret_version(request={"name": name})
-        logger.debug('Secret retrieved successfully', secret_id=secret_id)
-        return response.payload.data.decode("UTF-8").strip()
+        with span('secret', secret_id=secret_id):
+            return secret_cache.get(secret_id)
     except Exception as e:
         logger.error('Failed to fetch secret',
                      secret_id=secret_id,
@@ -137,19 +649,39 @@ def get_secret(secret_id: str) -> str:
         raise
 
 
+def raise_for_status(response):
+    """Raise for HTTP errors, dropping cached secrets when MuralPay rejects them."""
+    if response.status_code == 401:
+        logger.warning('Upstream rejected credentials, invalidating cached secrets',
+                       url=response.url)
+        secret_cache.invalidate()
+    response.raise_for_status()
+
+
 # --- MuralPay API Calls ---
-def tos_call(org, headers):
+def link_cache_key(endpoint, org):
+    """Cache key for an org's TOS or KYC link: (endpoint, org_id, tosStatus|kycStatus.type)."""
+    return endpoint, org['id'], f"{org['tosStatus']}|{(org.get('kycStatus') or {}).get('type')}"
+
+
+def tos_call(org, api_key):
     logger.info('Checking TOS status', org_id=org['id'])
     if org['tosStatus'] != 'ACCEPTED':
-        tos_url = f"{base_url}/organizations/{org['id']}/tos-link"
-        logger.debug('Making TOS API call', url=tos_url)
+        cache_key = link_cache_key('tos_link', org)
+        tos_link = link_cache.get(cache_key)
+        if tos_link is not None:
+            logger.debug('Reusing TOS link', org_id=org['id'])
+            return tos_link
+        tos_path = f"/organizations/{org['id']}/tos-link"
+        logger.debug('Making TOS API call', url=upstream.url(tos_path))
         try:
-            response = requests.get(tos_url, headers=headers)
-            response.raise_for_status()
-            response_json = response.json()
+            response = upstream.get('tos_link', tos_path, api_key)
+            raise_for_status(response)
+            response_json = upstream.decode(response)
             logger.info('TOS link generated',
                         org_id=org['id'],
                         tos_link=response_json['tosLink'])
+            link_cache.set(cache_key, response_json['tosLink'])
             return response_json['tosLink']
         except requests.exceptions.RequestException as e:
             logger.error('TOS API call failed',
@@ -161,18 +693,24 @@ def tos_call(org, headers):
     return org['tosStatus']
 
 
-def kyc_call(org, headers):
+def kyc_call(org, api_key):
     logger.info('Checking KYC status', org_id=org['id'])
     if org['tosStatus'] != 'INACTIVE':
-        kyc_url = f"{base_url}/organizations/{org['id']}/kyc-link"
-        logger.debug('Making KYC API call', url=kyc_url)
+        cache_key = link_cache_key('kyc_link', org)
+        kyc_link = link_cache.get(cache_key)
+        if kyc_link is not None:
+            logger.debug('Reusing KYC link', org_id=org['id'])
+            return kyc_link
+        kyc_path = f"/organizations/{org['id']}/kyc-link"
+        logger.debug('Making KYC API call', url=upstream.url(kyc_path))
         try:
-            response = requests.get(kyc_url, headers=headers)
-            response.raise_for_status()
-            response_json = response.json()
+            response = upstream.get('kyc_link', kyc_path, api_key)
+            raise_for_status(response)
+            response_json = upstream.decode(response)
             logger.info('KYC link generated',
                         org_id=org['id'],
                         kyc_link=response_json['kycLink'])
+            link_cache.set(cache_key, response_json['kycLink'])
             return response_json['kycLink']
         except requests.exceptions.RequestException as e:
             logger.error('KYC API call failed',
@@ -184,24 +722,19 @@ def kyc_call(org, headers):
     return org['kycStatus']
 
 
-def organization_call(api_key: str, id: str):
-    url = f"{base_url}/organizations/{id}"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}"
-    }
+def fetch_organization(api_key: str, id: str):
     logger.info('Fetching organization', org_id=id)
     try:
         start_time = time.time()
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
+        response = upstream.get('organization', f"/organizations/{id}", api_key)
+        raise_for_status(response)
         duration = time.time() - start_time
+        data = upstream.decode(response)
         logger.debug('Organization data retrieved',
                      org_id=id,
                      duration_ms=round(duration * 1000, 2),
-                     response_data=response.json())
-        return response.json(), response.status_code
+                     response_data=data)
+        return data, response.status_code
     except requests.exceptions.RequestException as e:
         logger.error('Failed to fetch organization',
                      org_id=id,
@@ -210,35 +743,98 @@ def organization_call(api_key: str, id: str):
         raise
 
 
-def organization_list_call(api_key: str):
-    url = base_url + "/organizations/search"
+def organization_call(api_key: str, id: str):
+    return cached_read(('organization', id, None),
+                       lambda: fetch_organization(api_key, id))
+
+
+def enrich_organization(org, api_key):
+    """Attach TOS/KYC links to an organization in place."""
+    logger.info('Processing organization', org_id=org['id'])
+    org['tosStatus'] = tos_call(org, api_key)
+    if org['tosStatus'] == 'ACCEPTED' and org['kycStatus']['type'] == 'INACTIVE':
+        kyc_dict = org['kycStatus']
+        kyc_dict['kycUrl'] = kyc_call(org, api_key)
+        org['kycStatus'] = kyc_dict
+        logger.debug('Updated KYC status', org_id=org['id'])
+    return org
+
+
+def iter_enriched_organizations(org_list, api_key, timeout=None):
+    """Enrich organizations concurrently on the shared worker pool.
+
+    Yields (index, organization) pairs in completion order. Workers operate
+    on copies so a straggler that outlives its timeout cannot mutate a
+    record that is already being serialized. A failed or timed out
+    organization is still yielded, marked with an `enrichmentError`,
+    instead of failing the whole list.
+    """
+    timeout = org_enrichment_timeout if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+
+    def enrich(org):
+        if time.monotonic() >= deadline:
+            raise TimeoutError('Enrichment deadline passed before the organization was processed')
+        return enrich_organization({**org, 'kycStatus': dict(org['kycStatus'])}, api_key)
+
+    def failed(org, e):
+        logger.warning('Organization enrichment failed',
+                       org_id=org['id'],
+                       error=str(e),
+                       error_type=type(e).__name__)
+        return {**org, 'enrichmentError': str(e)}
+
+    pending = {fanout_pool.submit(with_request_context(enrich), org): index
+               for index, org in enumerate(org_list)}
+    try:
+        for future in as_completed(list(pending), timeout=max(deadline - time.monotonic(), 0)):
+            index = pending.pop(future)
+            try:
+                yield index, future.result()
+            except Exception as e:
+                yield index, failed(org_list[index], e)
+    except FuturesTimeoutError:
+        for future, index in pending.items():
+            future.cancel()
+            yield index, failed(org_list[index],
+                                TimeoutError(f'Enrichment timed out after {timeout} seconds'))
+
+
+def enrich_organizations(org_list, api_key, timeout=None):
+    """Enriched copies of `org_list`, in the original order."""
+    enriched = [None] * len(org_list)
+    for index, org in iter_enriched_organizations(org_list, api_key, timeout):
+        enriched[index] = org
+    return enriched
+
+
+def organization_search_call(api_key: str):
     payload = {"filter": {"type": "name"}}
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}"
-    }
+    start_time = time.time()
+    response = upstream.post('organization_search', "/organizations/search", api_key,
+                             json=payload)
+    raise_for_status(response)
+    duration = time.time() - start_time
+    org_list = upstream.decode(response)['results']
+    logger.debug('Retrieved organizations',
+                 count=len(org_list),
+                 duration_ms=round(duration * 1000, 2))
+    return org_list, response.status_code
+
+
+def search_organizations(api_key: str):
+    """The organization list, from the snapshot store when one is configured."""
+    if snapshot_store is None:
+        return organization_search_call(api_key)
+    return snapshot_read('organizations', None, lambda: organization_search_call(api_key)[0],
+                         snapshot_store.organizations), 200
+
+
+def organization_list_call(api_key: str):
     logger.info('Fetching organization list')
     try:
-        start_time = time.time()
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        duration = time.time() - start_time
-        org_list = response.json()['results']
-        logger.debug('Retrieved organizations',
-                     count=len(org_list),
-                     duration_ms=round(duration * 1000, 2))
-
-        for org in org_list:
-            logger.info('Processing organization', org_id=org['id'])
-            org['tosStatus'] = tos_call(org, headers)
-            if org['tosStatus'] == 'ACCEPTED' and org['kycStatus']['type'] == 'INACTIVE':
-                kyc_dict = org['kycStatus']
-                kyc_dict['kycUrl'] = kyc_call(org, headers)
-                org['kycStatus'] = kyc_dict
-                logger.debug('Updated KYC status', org_id=org['id'])
-
-        return org_list, response.status_code
+        org_list, status = search_organizations(api_key)
+        return enrich_organizations(org_list, api_key), status
     except requests.exceptions.RequestException as e:
         logger.error('Failed to fetch organization list',
                      error=str(e),
@@ -247,118 +843,124 @@ def organization_list_call(api_key: str):
 
 
 def create_organization_call(api_key: str, body: dict):
-    url = base_url + "/organizations"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}"
-    }
     logger.info("Creating new organization...")
-    response = requests.post(url, json=body, headers=headers)
-    response.raise_for_status()
-    return response.json(), response.status_code
+    response = upstream.post('organization_create', "/organizations", api_key, json=body)
+    raise_for_status(response)
+    return upstream.decode(response), response.status_code
 
 
-def account_call(api_key: str, org_id: str, account_id: str):
-    url = f"{base_url}/accounts/{account_id}"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}",
-        "on-behalf-of": org_id
-    }
+def fetch_account(api_key: str, org_id: str, account_id: str):
     logger.info("Fetching account ...")
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    account_response = response.json()
+    response = upstream.get('account', f"/accounts/{account_id}", api_key, org_id)
+    raise_for_status(response)
+    account_response = upstream.decode(response)
     return account_response, response.status_code
 
 
-def account_list_call(api_key: str, org_id: str):
-    url = base_url + "/accounts"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}",
-        "on-behalf-of": org_id
-    }
+def account_call(api_key: str, org_id: str, account_id: str):
+    if snapshot_store is not None:
+        account = snapshot_read('accounts', org_id, lambda: fetch_account_list(api_key, org_id)[0],
+                                lambda: snapshot_store.account(org_id, account_id))
+        if account is not None:
+            return account, 200
+    return cached_read(('account', org_id, account_id),
+                       lambda: fetch_account(api_key, org_id, account_id))
+
+
+def fetch_account_list(api_key: str, org_id: str):
     logger.info("Fetching account list...")
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
-    accounts_list = response.json()
+    response = upstream.get('account_list', "/accounts", api_key, org_id)
+    raise_for_status(response)
+    accounts_list = upstream.decode(response)
     return accounts_list, response.status_code
 
 
+def account_list_call(api_key: str, org_id: str):
+    if snapshot_store is not None:
+        return snapshot_read('accounts', org_id, lambda: fetch_account_list(api_key, org_id)[0],
+                             lambda: snapshot_store.accounts(org_id)), 200
+    return cached_read(('account_list', org_id, None),
+                       lambda: fetch_account_list(api_key, org_id))
+
+
+def accounts_by_organization_call(api_key: str, skip_empty: bool = False):
+    """Fetch every organization's accounts in parallel, grouped by organization."""
+    logger.info("Fetching accounts for all organizations...")
+    org_list, status = search_organizations(api_key)
+
+    def fetch(org_id):
+        accounts, _ = account_list_call(api_key, org_id)
+        return accounts
+
+    futures = [fanout_pool.submit(with_request_context(fetch), org['id']) for org in org_list]
+    groups = []
+    for org, future in zip(org_list, futures):
+        group = {
+            'organization': {key: org.get(key) for key in ('id', 'name', 'firstName', 'lastName')},
+            'accounts': []
+        }
+        try:
+            group['accounts'] = future.result()
+        except Exception as e:
+            logger.warning('Failed to fetch accounts for organization',
+                           org_id=org['id'],
+                           error=str(e),
+                           error_type=type(e).__name__)
+            group['error'] = str(e)
+        if skip_empty and not group['accounts'] and 'error' not in group:
+            continue
+        groups.append(group)
+    return groups, status
+
+
 def create_account_call(api_key: str, org_id: str, body: dict):
-    url = base_url + "/accounts"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}",
-        "on-behalf-of": org_id
-    }
     logger.info("Creating new account for" + org_id)
-    response = requests.post(url, json=body, headers=headers)
-    response.raise_for_status()
-    return response.json(), response.status_code
+    response = upstream.post('account_create', "/accounts", api_key, org_id, json=body)
+    raise_for_status(response)
+    return upstream.decode(response), response.status_code
 
 
-def create_payout_request(api_key: str, org_id: str, body: dict):
-    url = base_url + "/payouts/payout"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}",
-        "on-behalf-of": org_id
-    }
+def create_payout_request(api_key: str, org_id: str, body: dict, idempotency_key: str = None):
     logger.info("Creating new payout request...")
-    response = requests.post(url, json=body, headers=headers)
-    response.raise_for_status()
-    return response.json(), response.status_code
+    headers = {"idempotency-key": idempotency_key} if idempotency_key else None
+    response = upstream.post('payout_create', "/payouts/payout", api_key, org_id, json=body,
+                             headers=headers)
+    raise_for_status(response)
+    return upstream.decode(response), response.status_code
 
 
-def execute_payout_request(api_key: str, transfer_api_key: str, org_id: str, payout_id: str):
-    url = f"{base_url}/payouts/payout/{payout_id}/execute"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "transfer-api-key": transfer_api_key,
-        "authorization": f"Bearer {api_key}",
-        "on-behalf-of": org_id
-    }
+def execute_payout_request(api_key: str, transfer_api_key: str, org_id: str, payout_id: str,
+                           idempotency_key: str = None):
     logger.info("Executing new payout request...")
-    response = requests.post(url, headers=headers)
-    response.raise_for_status()
-    return response.json(), response.status_code
+    headers = {"transfer-api-key": transfer_api_key}
+    if idempotency_key:
+        headers["idempotency-key"] = idempotency_key
+    response = upstream.post('payout_execute', f"/payouts/payout/{payout_id}/execute",
+                             api_key, org_id,
+                             headers=headers)
+    raise_for_status(response)
+    return upstream.decode(response), response.status_code
 
 
-def search_payout_requests(api_key: str, org_id: str, payload: dict):
-    url = f"{base_url}/payouts/search"
-    headers = {
-        "accept": "application/json",
-        "content-type": "application/json",
-        "authorization": f"Bearer {api_key}",
-        "on-behalf-of": org_id
-    }
+def search_payout_requests(api_key: str, org_id: str, payload: dict, params: dict = None):
     logger.info("Searching payout requests", org_id=org_id)
     try:
         start_time = time.time()
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-        response.raise_for_status()
+        response = upstream.post('payout_search', "/payouts/search", api_key, org_id,
+                                 json=payload, params=params)
+        raise_for_status(response)
         duration = time.time() - start_time
-        data = response.json()
-        
-        response_size = len(str(data))
+        data = upstream.decode(response)
         logger.debug('Payout requests retrieved',
                      org_id=org_id,
-                     count=len(data.get('results', [])),
+                     count=lambda: len(data.get('results', [])),
                      duration_ms=round(duration * 1000, 2),
-                     response_size_bytes=response_size)
+                     response_size_bytes=len(response.content))
         return data, response.status_code
     except requests.exceptions.Timeout:
         logger.error('Timeout while fetching payout requests',
                      org_id=org_id,
-                     error='Request timed out after 30 seconds')
+                     error=f"Request timed out after {upstream.timeout_for('payout_search')[1]} seconds")
         raise
     except requests.exceptions.RequestException as e:
         logger.error('Failed to fetch payout requests',
@@ -368,56 +970,180 @@ def search_payout_requests(api_key: str, org_id: str, payload: dict):
         raise
 
 
+def iter_payout_history(api_key: str, org_id: str):
+    """Every payout of an organization, in search order, for a snapshot sync."""
+    payload = {"filter": {"type": "payoutStatus", "statuses": list(PAYOUT_STATUSES)}}
+    params = {'limit': payout_search_page_size}
+    for _ in range(snapshot_max_payout_pages):
+        data, _ = search_payout_requests(api_key, org_id, payload, params)
+        yield from data.get('results', [])
+        if not data.get('nextId'):
+            return
+        params = {**params, 'nextId': data['nextId']}
+    logger.warning('Payout history truncated for snapshot',
+                   org_id=org_id,
+                   max_pages=snapshot_max_payout_pages)
+
+
+def payout_status_filter(body):
+    """Statuses a payout search body filters on, or None if the snapshot cannot answer it."""
+    if not isinstance(body, dict) or not body.get('filter'):
+        return ()
+    search_filter = body['filter']
+    if search_filter.get('type') == 'payoutStatus' and isinstance(search_filter.get('statuses'), list):
+        return tuple(search_filter['statuses'])
+    return None
+
+
+def snapshot_payout_page(api_key, org_id, account_id, statuses, position, limit):
+    """One page of an account's payouts from the snapshot store, plus the next position."""
+    offset = position[1] if position else 0
+    page, next_offset = snapshot_read(
+        'payouts', org_id, lambda: iter_payout_history(api_key, org_id),
+        lambda: snapshot_store.payouts(org_id, account_id, statuses, offset, limit))
+    return page, (SNAPSHOT_CURSOR, next_offset) if next_offset is not None else None
+
+
+def payout_history_call(api_key: str, org_id: str, account_id: str, body: dict):
+    """Every payout of one account matching the search body, for grid queries."""
+    statuses = payout_status_filter(body) if snapshot_store is not None else None
+    if statuses is not None:
+        return snapshot_read('payouts', org_id, lambda: iter_payout_history(api_key, org_id),
+                             lambda: snapshot_store.payouts(org_id, account_id, statuses, limit=None)[0])
+    normalized = json.dumps(body, sort_keys=True, separators=(',', ':'))
+    history, _ = cached_read(
+        ('payout_history', org_id, f'{account_id}:{normalized}'),
+        lambda: (list(PayoutPager(api_key, org_id, account_id, body)), 200))
+    return history
+
+
+def encode_payout_cursor(position):
+    if position is None:
+        return None
+    raw = json.dumps({'n': position[0], 'o': position[1]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_payout_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return raw['n'], int(raw['o'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise BadRequestError(f'Invalid payout cursor: {cursor}') from e
+
+
+class PayoutPager:
+    """Lazily walk upstream payout search pages, yielding one account's payouts.
+
+    MuralPay's payout search cannot filter by source account, so pages are
+    fetched on demand and filtered as they arrive; iteration stops as soon as
+    the caller has enough rows. `position` is the (upstream nextId, offset)
+    just past the last payout handed out, or None once the history is
+    exhausted, and round-trips to the SPA as an opaque cursor.
+    """
+
+    def __init__(self, api_key, org_id, account_id, payload, position=None,
+                 page_size=None, max_pages=None):
+        self.api_key = api_key
+        self.org_id = org_id
+        self.account_id = account_id
+        self.payload = payload
+        self.position = position or (None, 0)
+        self.page_size = page_size or payout_search_page_size
+        self.max_pages = max_pages or payout_search_max_pages
+        self.pages_fetched = 0
+
+    def __iter__(self):
+        page_cursor, offset = self.position
+        while self.pages_fetched < self.max_pages:
+            data, _ = search_payout_requests(self.api_key, self.org_id, self.payload,
+                                             self.page_params(page_cursor))
+            self.pages_fetched += 1
+            yield from self.scan_page(page_cursor, offset, data)
+            if self.position is None:
+                return
+            page_cursor, offset = self.position
+
+    def page_params(self, page_cursor):
+        params = {'limit': self.page_size}
+        if page_cursor:
+            params['nextId'] = page_cursor
+        return params
+
+    def scan_page(self, page_cursor, offset, data):
+        """Yield this account's payouts from one search page, advancing `position`."""
+        results = data.get('results', [])
+        next_page = data.get('nextId')
+        end_of_page = (next_page, 0) if next_page else None
+
+        for index in range(offset, len(results)):
+            self.position = (page_cursor, index + 1) if index + 1 < len(results) else end_of_page
+            if results[index].get('sourceAccountId') == self.account_id:
+                yield results[index]
+
+        self.position = end_of_page
+
+
 # --- Flask Routes ---
-@app.route("/organizations/<org_id>", methods=["GET", "OPTIONS"])
-@app.route("/api/organizations/<org_id>", methods=["GET", "OPTIONS"])
+def api_route(rule, methods):
+    """Register a view at `rule` and at `/api` + `rule`, where the hosting rewrite sends it."""
+    def decorator(view):
+        app.route(rule, methods=methods)(view)
+        return app.route('/api' + rule, methods=methods)(view)
+    return decorator
+
+
+@api_route("/organizations/<org_id>", methods=["GET"])
 def get_organization(org_id):
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request', org_id=org_id)
-        return '', 204
     try:
         logger.info('Processing GET request', org_id=org_id)
         api_key = get_secret("API_KEY")
-        data, status = organization_call(api_key, org_id)
+        data, status = coalescer.do(request_key('get_organization', org_id),
+                                    lambda: organization_call(api_key, org_id))
         logger.debug('Organization data retrieved',
                      org_id=org_id,
                      status_code=status)
-        return jsonify(data), status
+        return cacheable_json(data, status)
     except Exception as e:
         logger.error('Error fetching organization',
                      org_id=org_id,
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/organizations", methods=["GET", "OPTIONS"])
-@app.route("/api/organizations", methods=["GET", "OPTIONS"])
+@api_route("/organizations", methods=["GET"])
 def get_organizations():
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for organizations list')
-        return '', 204
     try:
         logger.info('Processing GET request for organizations list')
         api_key = get_secret("API_KEY")
-        data, status = organization_list_call(api_key)
+        if wants_ndjson():
+            # Organizations are sent as their enrichment finishes, not in search order.
+            org_list, _ = search_organizations(api_key)
+            return ndjson_response(org for _, org in iter_enriched_organizations(org_list, api_key))
+        data, status = coalescer.do(request_key('get_organizations'),
+                                    lambda: organization_list_call(api_key))
         logger.debug('Organizations list retrieved',
                      count=len(data),
                      status_code=status)
+        if wants_grid():
+            # Enrichment builds a new list on every call, so there is no index to keep.
+            return grid_response('organization', data)
         return jsonify(data), status
+    except BadRequestError as e:
+        logger.warning('Invalid organizations list query', error=str(e))
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error('Error fetching organizations list',
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/api/organizations", methods=["POST", "OPTIONS"])
-@app.route("/organizations", methods=["POST", "OPTIONS"])
+@api_route("/organizations", methods=["POST"])
 def create_organization():
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for organization creation')
-        return '', 204
     try:
         logger.info('Processing POST request for organization creation')
         api_key = get_secret("API_KEY")
@@ -425,6 +1151,8 @@ def create_organization():
         logger.debug('Organization creation request',
                      request_body=body)
         data, status = create_organization_call(api_key, body)
+        response_cache.invalidate(org_id=data.get('id'))
+        expire_snapshot('organizations')
         logger.info('Organization created successfully',
                     org_id=data.get('id'),
                     status_code=status)
@@ -433,66 +1161,93 @@ def create_organization():
         logger.error('Error creating organization',
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+
+@api_route("/accounts", methods=["GET"])
+def get_accounts_by_organization():
+    try:
+        skip_empty = request.args.get('skipEmpty', 'false').lower() == 'true'
+        logger.info('Processing GET request for accounts by organization',
+                    skip_empty=skip_empty)
+        api_key = get_secret("API_KEY")
+        data, status = coalescer.do(
+            request_key('get_accounts_by_organization', body={'skipEmpty': skip_empty}),
+            lambda: accounts_by_organization_call(api_key, skip_empty))
+        logger.debug('Accounts by organization retrieved',
+                     org_count=len(data),
+                     status_code=status)
+        if wants_grid():
+            # Grid queries work on the flat list of accounts, each carrying its organization.
+            rows = [{**account, 'organization': group['organization']}
+                    for group in data for account in group['accounts']]
+            return grid_response('account', rows)
+        return jsonify(data), status
+    except BadRequestError as e:
+        logger.warning('Invalid accounts by organization query', error=str(e))
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error('Error fetching accounts by organization',
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
 
 
-@app.route("/api/accounts/<org_id>", methods=["GET", "OPTIONS"])
-@app.route("/accounts/<org_id>", methods=["GET", "OPTIONS"])
+@api_route("/accounts/<org_id>", methods=["GET"])
 def get_accounts(org_id):
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for accounts list', org_id=org_id)
-        return '', 204
     try:
         logger.info('Processing GET request for accounts list', org_id=org_id)
         api_key = get_secret("API_KEY")
-        data, status = account_list_call(api_key, org_id)
+        data, status = coalescer.do(request_key('get_accounts', org_id),
+                                    lambda: account_list_call(api_key, org_id))
         logger.debug('Accounts list retrieved',
                      org_id=org_id,
                      count=len(data),
                      status_code=status)
-        return jsonify(data), status
+        if wants_grid():
+            # Only the response cache hands back the same list between requests;
+            # snapshot reads are new lists and would never reuse an index.
+            index_key = ('accounts', org_id) if snapshot_store is None else None
+            return grid_response('account', data, index_key)
+        return cacheable_json(data, status)
+    except BadRequestError as e:
+        logger.warning('Invalid accounts list query',
+                       org_id=org_id,
+                       error=str(e))
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error('Error fetching accounts list',
                      org_id=org_id,
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/accounts/<org_id>/<account_id>", methods=["GET", "OPTIONS"])
-@app.route("/api/accounts/<org_id>/<account_id>", methods=["GET", "OPTIONS"])
+@api_route("/accounts/<org_id>/<account_id>", methods=["GET"])
 def get_account_by_id(org_id, account_id):
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for account',
-                     org_id=org_id,
-                     account_id=account_id)
-        return '', 204
     try:
         logger.info('Processing GET request for account',
                     org_id=org_id,
                     account_id=account_id)
         api_key = get_secret("API_KEY")
-        data, status = account_call(api_key, org_id, account_id)
+        data, status = coalescer.do(request_key('get_account_by_id', org_id, account_id),
+                                    lambda: account_call(api_key, org_id, account_id))
         logger.debug('Account data retrieved',
                      org_id=org_id,
                      account_id=account_id,
                      status_code=status)
-        return jsonify(data), status
+        return cacheable_json(data, status)
     except Exception as e:
         logger.error('Error fetching account',
                      org_id=org_id,
                      account_id=account_id,
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/accounts/<org_id>", methods=["POST", "OPTIONS"])
-@app.route("/api/accounts/<org_id>", methods=["POST", "OPTIONS"])
+@api_route("/accounts/<org_id>", methods=["POST"])
 def create_account(org_id):
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for account creation', org_id=org_id)
-        return '', 204
     try:
         logger.info('Processing POST request for account creation', org_id=org_id)
         api_key = get_secret("API_KEY")
@@ -501,6 +1256,8 @@ def create_account(org_id):
                      org_id=org_id,
                      request_body=body)
         data, status = create_account_call(api_key, org_id, body)
+        response_cache.invalidate('account_list', org_id)
+        expire_snapshot('accounts', org_id)
         logger.info('Account created successfully',
                     org_id=org_id,
                     account_id=data.get('id'),
@@ -511,17 +1268,11 @@ def create_account(org_id):
                      org_id=org_id,
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/payouts/<org_id>/<acc_id>", methods=["POST", "OPTIONS"])
-@app.route("/api/payouts/<org_id>/<acc_id>", methods=["POST", "OPTIONS"])
+@api_route("/payouts/<org_id>/<acc_id>", methods=["POST"])
 def get_payout_requests(org_id, acc_id):
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for payout requests',
-                     org_id=org_id,
-                     account_id=acc_id)
-        return '', 204
     try:
         logger.info('Processing POST request for payout requests',
                     org_id=org_id,
@@ -532,28 +1283,75 @@ def get_payout_requests(org_id, acc_id):
                      org_id=org_id,
                      account_id=acc_id,
                      request_body=body)
-        data, status = search_payout_requests(api_key, org_id, body)
-        filtered_payout_requests = [p for p in data['results'] if p.get("sourceAccountId") == acc_id]
-        return jsonify(filtered_payout_requests), status
-    
+        if wants_grid():
+            # Grid queries page by offset over the account's whole payout history.
+            key = request_key('payout_history', org_id, acc_id, body)
+            history = coalescer.do(key, lambda: payout_history_call(api_key, org_id, acc_id, body))
+            return grid_response('payout', history, key if snapshot_store is None else None)
+
+        limit = query_int('limit', payout_page_limit, 1, payout_page_max_limit)
+        position = decode_payout_cursor(request.args.get('nextId'))
+        statuses = payout_status_filter(body) if snapshot_store is not None else None
+        from_snapshot = position[0] == SNAPSHOT_CURSOR if position else statuses is not None
+        if from_snapshot and statuses is None:
+            raise BadRequestError('Payout cursor is no longer valid; start again from the first page')
+
+        if from_snapshot:
+            page, next_position = snapshot_payout_page(api_key, org_id, acc_id, statuses, position, limit)
+            if wants_ndjson():
+                return ndjson_response([*page, {'nextId': encode_payout_cursor(next_position)}])
+            response = jsonify(page)
+            if next_position:
+                response.headers['X-Next-Id'] = encode_payout_cursor(next_position)
+            return response, 200
+
+        if wants_ndjson():
+            # Rows go out as each upstream page is filtered; the cursor for
+            # the next page follows the last row as a {"nextId": ...} record.
+            pager = PayoutPager(api_key, org_id, acc_id, body, position=position)
+
+            def rows():
+                yield from itertools.islice(pager, limit)
+                yield {'nextId': encode_payout_cursor(pager.position)}
+
+            return ndjson_response(rows())
+
+        def load_page():
+            pager = PayoutPager(api_key, org_id, acc_id, body, position=position)
+            page = list(itertools.islice(pager, limit))
+            logger.debug('Payout requests page built',
+                         org_id=org_id,
+                         account_id=acc_id,
+                         count=len(page),
+                         upstream_pages=pager.pages_fetched)
+            return page, pager.position
+
+        filtered_payout_requests, next_position = coalescer.do(
+            request_key('get_payout_requests', org_id, acc_id,
+                        {'body': body, 'limit': limit, 'position': position}),
+            load_page)
+        response = jsonify(filtered_payout_requests)
+        next_id = encode_payout_cursor(next_position)
+        if next_id:
+            response.headers['X-Next-Id'] = next_id
+        return response, 200
+    except BadRequestError as e:
+        logger.warning('Invalid payout requests query',
+                       org_id=org_id,
+                       account_id=acc_id,
+                       error=str(e))
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error('Error fetching payout requests',
                      org_id=org_id,
                      account_id=acc_id,
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/payouts/<org_id>/<acc_id>/<payout_id>", methods=["POST", "OPTIONS"])
-@app.route("/api/payouts/<org_id>/<acc_id>/<payout_id>", methods=["POST", "OPTIONS"])
+@api_route("/payouts/<org_id>/<acc_id>/<payout_id>", methods=["POST"])
 def execute_payout_requests(org_id, acc_id, payout_id):
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for payout execution',
-                     org_id=org_id,
-                     account_id=acc_id,
-                     payout_id=payout_id)
-        return '', 204
     try:
         logger.info('Processing POST request for payout execution',
                     org_id=org_id,
@@ -562,6 +1360,12 @@ def execute_payout_requests(org_id, acc_id, payout_id):
         api_key = get_secret("API_KEY")
         transfer_api_key = get_secret("TRANSFER_API_KEY")
         data, status = execute_payout_request(api_key, transfer_api_key, org_id, payout_id)
+        # Executing moves funds, so the org's account balances are now stale.
+        response_cache.invalidate('account', org_id)
+        response_cache.invalidate('account_list', org_id)
+        response_cache.invalidate('payout_history', org_id)
+        expire_snapshot('accounts', org_id)
+        expire_snapshot('payouts', org_id)
         logger.info('Payout executed successfully',
                     org_id=org_id,
                     account_id=acc_id,
@@ -575,15 +1379,11 @@ def execute_payout_requests(org_id, acc_id, payout_id):
                      payout_id=payout_id,
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
 
 
-@app.route("/payouts/create/<org_id>", methods=["POST", "OPTIONS"])
-@app.route("/api/payouts/create/<org_id>", methods=["POST", "OPTIONS"])
+@api_route("/payouts/create/<org_id>", methods=["POST"])
 def create_payout_requests(org_id):
-    if request.method == 'OPTIONS':
-        logger.debug('Handling OPTIONS request for payout creation', org_id=org_id)
-        return '', 204
     try:
         logger.info('Processing POST request for payout creation', org_id=org_id)
         api_key = get_secret("API_KEY")
@@ -592,6 +1392,11 @@ def create_payout_requests(org_id):
                      org_id=org_id,
                      request_body=body)
         data, status = create_payout_request(api_key, org_id, body)
+        response_cache.invalidate('account', org_id)
+        response_cache.invalidate('account_list', org_id)
+        response_cache.invalidate('payout_history', org_id)
+        expire_snapshot('accounts', org_id)
+        expire_snapshot('payouts', org_id)
         logger.info('Payout created successfully',
                     org_id=org_id,
                     payout_id=data.get('id'),
@@ -602,18 +1407,413 @@ def create_payout_requests(org_id):
                      org_id=org_id,
                      error=str(e),
                      error_type=type(e).__name__)
-        return jsonify({"error": str(e)}), 500
+        return error_response(e)
+
+
+def payload_fingerprint(item):
+    """Hash of a bulk item's body, ignoring its idempotencyKey and the order of its fields."""
+    if isinstance(item, dict):
+        item = {name: value for name, value in item.items() if name != 'idempotencyKey'}
+    encoded = json.dumps(item, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def parse_bulk_items(body, field):
+    """Validate a bulk body up front and pair each item with its idempotency key.
+
+    An item's own `idempotencyKey` wins; otherwise it is derived from the
+    request's Idempotency-Key header and the item's payload fingerprint (plus
+    an occurrence count for identical items), so resending the same items
+    with the same header replays them even if the list was reordered.
+    """
+    items = body.get(field) if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BadRequestError(f'Bulk body must be an object with a non-empty "{field}" list')
+    if len(items) > bulk_payout_max_items:
+        raise BadRequestError(f'A bulk request may hold at most {bulk_payout_max_items} items')
+    request_key_header = request.headers.get(IDEMPOTENCY_HEADER)
+    keyed = []
+    occurrences = {}
+    for index, item in enumerate(items):
+        own_key = item.get('idempotencyKey') if isinstance(item, dict) else None
+        if own_key is None and not request_key_header:
+            raise BadRequestError(f'Item {index} needs an idempotencyKey, or send an '
+                                  f'{IDEMPOTENCY_HEADER} header for the whole request')
+        if own_key is not None and (not isinstance(own_key, str) or not own_key):
+            raise BadRequestError(f'Item {index} idempotencyKey must be a non-empty string')
+        if own_key is None:
+            fingerprint = payload_fingerprint(item)[:32]
+            occurrence = occurrences.get(fingerprint, 0)
+            occurrences[fingerprint] = occurrence + 1
+            own_key = f'{request_key_header}:{fingerprint}' + (f':{occurrence}' if occurrence else '')
+        keyed.append((own_key, item))
+    if len({key for key, _ in keyed}) != len(keyed):
+        raise BadRequestError('Idempotency keys must be unique within a bulk request')
+    return keyed
+
+
+def validate_payout_body(index, item):
+    if not isinstance(item, dict):
+        raise BadRequestError(f'Payout {index} must be an object')
+    if not isinstance(item.get('sourceAccountId'), str) or not item['sourceAccountId']:
+        raise BadRequestError(f'Payout {index} needs a sourceAccountId')
+    payouts = item.get('payouts')
+    if not isinstance(payouts, list) or not payouts:
+        raise BadRequestError(f'Payout {index} needs a non-empty "payouts" list')
+    for entry in payouts:
+        amount = entry.get('amount') if isinstance(entry, dict) else None
+        if (not isinstance(amount, dict) or not isinstance(amount.get('tokenSymbol'), str)
+                or not isinstance(amount.get('tokenAmount'), (int, float))
+                or isinstance(amount.get('tokenAmount'), bool) or amount['tokenAmount'] <= 0):
+            raise BadRequestError(f'Payout {index} has an entry without a positive amount')
+
+
+def write_outcome_is_known(e):
+    """True if a failed payout write certainly did not take effect upstream, so it may be retried."""
+    if isinstance(e, (CircuitOpenError, RateLimitedError, requests.exceptions.ConnectTimeout)):
+        return True
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    return status is not None and status < 500
+
+
+def run_idempotent(key, write, fingerprint=None):
+    """Run `write()` at most once per idempotency key; returns (data, status, replayed).
+
+    A key already used for a payload with a different `fingerprint` raises
+    IdempotencyMismatchError instead of replaying the other payload's result.
+    """
+    entry = idempotency_ledger.claim(key, fingerprint)
+    if entry is not None:
+        if entry.fingerprint != fingerprint:
+            raise IdempotencyMismatchError('This idempotency key was already used for a different payload')
+        if entry.state == IdempotencyLedger.DONE:
+            return (*entry.result, True)
+        if entry.state == IdempotencyLedger.PENDING:
+            raise IdempotencyConflictError('A write with this idempotency key is still running')
+        raise IdempotencyConflictError(f'A write with this idempotency key failed with an unknown '
+                                       f'outcome ({entry.error}); check it before retrying with a new key')
+    try:
+        data, status = write()
+    except Exception as e:
+        if write_outcome_is_known(e):
+            idempotency_ledger.release(key)
+        else:
+            idempotency_ledger.mark_unknown(key, str(e))
+        raise
+    idempotency_ledger.complete(key, (data, status))
+    return data, status, False
+
+
+def claim_bulk_request(org_id, operation, keyed_items):
+    """Record the payload sent under the request's Idempotency-Key header.
+
+    Raises IdempotencyMismatchError if the header was used before for a
+    different set of items, so a changed resend is refused as a whole
+    rather than partly replayed and partly written.
+    """
+    request_key_header = request.headers.get(IDEMPOTENCY_HEADER)
+    if not request_key_header:
+        return
+    fingerprint = payload_fingerprint(sorted(f'{key}:{payload_fingerprint(item)}' for key, item in keyed_items))
+    key = (org_id, operation, 'request', request_key_header)
+    entry = idempotency_ledger.claim(key, fingerprint)
+    if entry is None:
+        idempotency_ledger.complete(key, None)
+    elif entry.fingerprint != fingerprint:
+        raise IdempotencyMismatchError(f'{IDEMPOTENCY_HEADER} {request_key_header} was already used '
+                                       f'for a different set of items')
+
+
+def bulk_payout_response(org_id, operation, keyed_items, write):
+    """Submit every item to the bulk pool and stream one NDJSON result per item as it completes.
+
+    Idempotency keys are remembered per (org, operation) together with the
+    fingerprint of the item sent under them. Each record is {"index",
+    "idempotencyKey", "status", "data" | "error", "replayed"}; a final
+    {"summary": ...} record counts the outcomes. Items keep running if the
+    client goes away, and their results are replayed by idempotency key on
+    retry; a key resent with a different payload fails with 422.
+    """
+    claim_bulk_request(org_id, operation, keyed_items)
+
+    def run(key, item):
+        with span('bulk.item', key=key):
+            return run_idempotent((org_id, operation, key), lambda: write(key, item),
+                                  payload_fingerprint(item))
+
+    pending = {bulk_payout_pool.submit(with_request_context(run), key, item): index
+               for index, (key, item) in enumerate(keyed_items)}
+
+    def results():
+        summary = {'succeeded': 0, 'failed': 0, 'replayed': 0}
+        try:
+            for future in as_completed(list(pending)):
+                index = pending[future]
+                record = {'index': index, 'idempotencyKey': keyed_items[index][0]}
+                try:
+                    data, status, replayed = future.result()
+                    record.update(status=status, data=data, replayed=replayed)
+                    summary['replayed' if replayed else 'succeeded'] += 1
+                except Exception as e:
+                    if isinstance(e, IdempotencyMismatchError):
+                        status = 422
+                    elif isinstance(e, IdempotencyConflictError):
+                        status = 409
+                    elif isinstance(e, RateLimitedError):
+                        status = 429
+                    elif is_upstream_unavailable(e):
+                        status = 503
+                    else:
+                        status = getattr(getattr(e, 'response', None), 'status_code', None) or 500
+                    logger.warning('Bulk payout item failed',
+                                   org_id=org_id,
+                                   index=index,
+                                   status_code=status,
+                                   error=str(e),
+                                   error_type=type(e).__name__)
+                    record.update(status=status, error=str(e))
+                    summary['failed'] += 1
+                yield record
+        finally:
+            response_cache.invalidate('account', org_id)
+            response_cache.invalidate('account_list', org_id)
+            response_cache.invalidate('payout_history', org_id)
+            expire_snapshot('accounts', org_id)
+            expire_snapshot('payouts', org_id)
+            logger.info('Bulk payout run finished', org_id=org_id, **summary)
+        yield {'summary': summary}
+
+    return ndjson_response(results())
+
+
+@api_route("/payouts/bulk/<org_id>", methods=["POST"])
+def create_payout_requests_bulk(org_id):
+    try:
+        keyed_items = parse_bulk_items(request.get_json(silent=True), 'payouts')
+        for index, (_, item) in enumerate(keyed_items):
+            validate_payout_body(index, item)
+        logger.info('Processing bulk payout creation', org_id=org_id, count=len(keyed_items))
+        api_key = get_secret("API_KEY")
+
+        def write(key, item):
+            body = {name: value for name, value in item.items() if name != 'idempotencyKey'}
+            return create_payout_request(api_key, org_id, body, idempotency_key=key)
+
+        return bulk_payout_response(org_id, 'create', keyed_items, write)
+    except BadRequestError as e:
+        logger.warning('Invalid bulk payout creation request', org_id=org_id, error=str(e))
+        return jsonify({"error": str(e)}), 400
+    except IdempotencyMismatchError as e:
+        logger.warning('Idempotency key reused for a different bulk payout creation',
+                       org_id=org_id,
+                       error=str(e))
+        return jsonify({"error": str(e)}), 422
+    except Exception as e:
+        logger.error('Error creating payouts in bulk',
+                     org_id=org_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@api_route("/payouts/bulk-execute/<org_id>", methods=["POST"])
+def execute_payout_requests_bulk(org_id):
+    try:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and isinstance(body.get('payoutIds'), list):
+            # Executing a payout twice is never intended, so the payout id is
+            # the idempotency key unless the caller supplies one.
+            body = {'payoutIds': [item if isinstance(item, dict) else
+                                  {'payoutId': item, 'idempotencyKey': item}
+                                  for item in body['payoutIds']]}
+        keyed_items = parse_bulk_items(body, 'payoutIds')
+        for index, (_, item) in enumerate(keyed_items):
+            if not isinstance(item.get('payoutId'), str) or not item['payoutId']:
+                raise BadRequestError(f'Item {index} needs a payout id')
+        if len({item['payoutId'] for _, item in keyed_items}) != len(keyed_items):
+            raise BadRequestError('Each payout may appear only once in a bulk execution')
+        logger.info('Processing bulk payout execution', org_id=org_id, count=len(keyed_items))
+        api_key = get_secret("API_KEY")
+        transfer_api_key = get_secret("TRANSFER_API_KEY")
+
+        def write(key, item):
+            return execute_payout_request(api_key, transfer_api_key, org_id, item['payoutId'],
+                                          idempotency_key=key)
+
+        return bulk_payout_response(org_id, 'execute', keyed_items, write)
+    except BadRequestError as e:
+        logger.warning('Invalid bulk payout execution request', org_id=org_id, error=str(e))
+        return jsonify({"error": str(e)}), 400
+    except IdempotencyMismatchError as e:
+        logger.warning('Idempotency key reused for a different bulk payout execution',
+                       org_id=org_id,
+                       error=str(e))
+        return jsonify({"error": str(e)}), 422
+    except Exception as e:
+        logger.error('Error executing payouts in bulk',
+                     org_id=org_id,
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@api_route("/geo", methods=["GET"])
+def get_geo():
+    ip, country = request_geo()
+    logger.debug('Resolved client location', client_ip=ip, country=country)
+    return jsonify({'ip': ip, 'country': country, 'restricted': country in restricted_countries}), 200
+
+
+# Sub-response headers a batch item carries back to the caller.
+BATCH_RESPONSE_HEADERS = ('ETag', 'X-Next-Id', 'Retry-After', 'Warning')
+# Routes that always stream NDJSON, whose per-item results a batch body cannot carry.
+BATCH_EXCLUDED_ENDPOINTS = frozenset(('create_payout_requests_bulk', 'execute_payout_requests_bulk'))
+
+
+def parse_batch_requests(body):
+    """Validate a batch body: {"requests": [{"id", "method", "path", "body"?, "headers"?}, ...]}.
+
+    Returns the items with each method defaulted and upper-cased.
+    """
+    items = body.get('requests') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BadRequestError('Batch body must be an object with a non-empty "requests" list')
+    if len(items) > batch_max_requests:
+        raise BadRequestError(f'A batch may hold at most {batch_max_requests} requests')
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise BadRequestError(f'Batch request {index} must be an object')
+        method = item.get('method', 'GET')
+        if not isinstance(method, str) or method.upper() not in ('GET', 'POST'):
+            raise BadRequestError(f'Batch request {index} must use GET or POST')
+        if not isinstance(item.get('path'), str) or not item['path'].startswith('/'):
+            raise BadRequestError(f'Batch request {index} needs a path starting with "/"')
+        if not isinstance(item.get('headers', {}), dict):
+            raise BadRequestError(f'Batch request {index} headers must be an object')
+        parsed.append({**item, 'method': method.upper()})
+    return parsed
+
+
+def run_batch_item(item, values, profile=None):
+    """Serve one batch sub-request through its route's view function.
+
+    Runs in its own request context carrying the batch's `g` values, so
+    logs share its correlation id and upstream spans land on its trace. The
+    batch request's before/after hooks are not re-run per item.
+    """
+    headers = {**item.get('headers', {}), 'Accept': 'application/json'}
+    with app.test_request_context(item['path'], method=item['method'],
+                                  json=item.get('body'), headers=headers), profiler.attach(profile):
+        g.__dict__.update(values)
+        rule = request.url_rule
+        if request.routing_exception is not None:
+            response = app.make_response(
+                (jsonify({"error": request.routing_exception.description}),
+                 request.routing_exception.code))
+        elif rule.endpoint == 'batch':
+            response = app.make_response((jsonify({"error": "Batches cannot be nested"}), 400))
+        elif rule.endpoint in BATCH_EXCLUDED_ENDPOINTS:
+            response = app.make_response(
+                (jsonify({"error": "Bulk payout routes stream their results and cannot run in a batch; "
+                                   "call them directly"}), 400))
+        else:
+            blocked = geo_restricted_response() if rule.endpoint in GEO_RESTRICTED_ENDPOINTS else None
+            if blocked is not None:
+                response = blocked
+            else:
+                with span('batch.item', endpoint=rule.endpoint):
+                    response = app.make_response(app.view_functions[rule.endpoint](**request.view_args))
+        if g.get('served_stale'):
+            response.headers['Warning'] = '110 - "Response is Stale"'
+        data = response.get_data()
+        return {
+            'id': item.get('id'),
+            'status': response.status_code,
+            'headers': {name: response.headers[name]
+                        for name in BATCH_RESPONSE_HEADERS if name in response.headers},
+            'body': serialization.loads(data) if response.is_json and data else None,
+        }
+
+
+@api_route("/batch", methods=["POST"])
+def batch():
+    try:
+        items = parse_batch_requests(request.get_json(silent=True))
+        logger.info('Processing batch request', count=len(items))
+        values = {key: value for key, value in g.__dict__.items() if key not in REQUEST_OWNED_G_KEYS}
+        futures = [batch_pool.submit(run_batch_item, item, values, g.get('profile')) for item in items]
+        results = []
+        for item, future in zip(items, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error('Error serving batch item',
+                             item_id=item.get('id'),
+                             path=item['path'],
+                             error=str(e),
+                             error_type=type(e).__name__)
+                results.append({'id': item.get('id'), 'status': 500, 'headers': {},
+                                'body': {"error": str(e)}})
+        logger.info('Batch finished',
+                    count=len(results),
+                    statuses=lambda: [result['status'] for result in results])
+        return jsonify({'responses': results}), 200
+    except BadRequestError as e:
+        logger.warning('Invalid batch request', error=str(e))
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error('Error processing batch',
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
+
+
+@api_route("/debug/profile", methods=["GET"])
+def get_profile_report():
+    """Per-route hot-path report from this instance's profiled requests.
+
+    `?format=folded` returns collapsed stacks for flame graph tools instead;
+    `?reset=true` clears the report after reading it. Answers 404 unless
+    the request carries the profiling token.
+    """
+    if not profile_authorized():
+        return jsonify({"error": "Not found"}), 404
+    try:
+        if request.args.get('format') == 'folded':
+            response = app.response_class(profiler.folded(), mimetype='text/plain')
+        else:
+            response = jsonify({'profiler': profiler.stats(), 'routes': profiler.report()})
+        if request.args.get('reset') == 'true':
+            profiler.reset()
+            logger.info('Profile report reset')
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error('Error building profile report',
+                     error=str(e),
+                     error_type=type(e).__name__)
+        return error_response(e)
 
 
 # --- Firebase Entry Point ---
 @https_fn.on_request()
 def main_function(request):
+    if request.method == 'OPTIONS':
+        return preflight(request.environ)
     logger.info('Processing main function request',
                 method=request.method,
                 path=request.path)
     try:
         with app.request_context(request.environ):
-            return app.full_dispatch_request()
+            # Not a span: after_request_combined has already written
+            # Server-Timing (whose total covers this) when dispatch returns.
+            started = time.perf_counter()
+            response = app.full_dispatch_request()
+            logger.debug('Dispatch finished',
+                         path=request.path,
+                         duration_ms=round((time.perf_counter() - started) * 1000, 2))
+            return response
 
     except Exception as e:
         logger.error('Error in main function',
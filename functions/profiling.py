@@ -0,0 +1,267 @@
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+from tracing import summarize
+
+_IGNORED_ALLOCATION_FILES = (tracemalloc.__file__, __file__)
+
+
+def frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def stack_of(frame, max_depth):
+    """Function labels from the outermost caller in to `frame`, at most `max_depth` deep."""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+class ProfileSession:
+    """One profiled request: the threads working on it and what was sampled from them."""
+
+    def __init__(self, route, trace_allocations):
+        self.route = route
+        self.thread_ids = {threading.get_ident()}
+        self.stacks = Counter()
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self.trace_allocations = trace_allocations
+        self.allocation_start = None
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+
+class _RouteProfile:
+    __slots__ = ('requests', 'wall_ms', 'cpu_ms', 'stacks', 'spans', 'allocations', 'peak_bytes')
+
+    def __init__(self):
+        self.requests = 0
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.stacks = Counter()
+        self.spans = Counter()
+        self.allocations = Counter()
+        self.peak_bytes = 0
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for individual requests, aggregated per route.
+
+    `start` registers the calling thread for a request; one daemon thread then
+    reads the stacks of every registered thread from `sys._current_frames()`
+    every `interval` seconds while any request is being profiled, and sleeps
+    otherwise. Worker threads doing the request's fan-out join its session
+    with `attach`. With `trace_allocations`, tracemalloc runs while a
+    profiled request is in flight and the request's net allocations by line
+    are recorded (concurrent requests' allocations overlap in that view).
+
+    `finish` folds a session into its route's totals: requests, wall and
+    request-thread CPU time, sampled stacks, span durations and allocations.
+    `report` summarises the hottest frames per route and `folded` renders
+    the stacks in the collapsed format flame graph tools read.
+    """
+
+    def __init__(self, interval=0.005, sample_rate=0.0, trace_allocations=True, max_depth=64,
+                 max_stacks_per_route=5000, allocation_frames=1):
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.trace_allocations = trace_allocations
+        self.max_depth = max_depth
+        self.max_stacks_per_route = max_stacks_per_route
+        self.allocation_frames = allocation_frames
+        self._lock = threading.Lock()
+        self._active = set()
+        self._wake = threading.Event()
+        self._sampler = None
+        self._routes = {}
+        self._allocation_users = 0
+        self._started_tracemalloc = False
+        self._stats = {'profiled': 0, 'samples': 0}
+
+    def sampled(self):
+        """Whether to profile a request that did not ask for it."""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    # --- Sessions ---
+    def start(self, route):
+        session = ProfileSession(route, self.trace_allocations)
+        if session.trace_allocations:
+            session.allocation_start = self._start_allocations()
+        with self._lock:
+            self._active.add(session)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+                self._sampler.start()
+        self._wake.set()
+        return session
+
+    @contextmanager
+    def attach(self, session):
+        """Sample the calling thread as part of `session` for the duration of the block."""
+        if session is None:
+            yield
+            return
+        thread_id = threading.get_ident()
+        with self._lock:
+            session.thread_ids.add(thread_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                session.thread_ids.discard(thread_id)
+
+    def finish(self, session, spans=None):
+        """Stop sampling `session`, add it to its route's totals and return its summary."""
+        cpu_ms = (time.thread_time() - session.cpu_started) * 1000
+        wall_ms = (time.perf_counter() - session.started) * 1000
+        with self._lock:
+            self._active.discard(session)
+            if not self._active:
+                self._wake.clear()
+        allocations, peak_bytes = Counter(), 0
+        if session.allocation_start is not None:
+            allocations, peak_bytes = self._finish_allocations(session.allocation_start)
+        span_ms = Counter({name: total for name, (total, _) in summarize(spans).items()})
+
+        with self._lock:
+            route = self._routes.setdefault(session.route, _RouteProfile())
+            route.requests += 1
+            route.wall_ms += wall_ms
+            route.cpu_ms += cpu_ms
+            route.spans.update(span_ms)
+            route.allocations.update(allocations)
+            route.peak_bytes = max(route.peak_bytes, peak_bytes)
+            for stack, count in session.stacks.items():
+                if stack in route.stacks or len(route.stacks) < self.max_stacks_per_route:
+                    route.stacks[stack] += count
+                else:
+                    route.stacks[('[other stacks]',)] += count
+            self._stats['profiled'] += 1
+
+        return {
+            'route': session.route,
+            'wall_ms': round(wall_ms, 2),
+            'cpu_ms': round(cpu_ms, 2),
+            'samples': session.samples,
+            'hot_frames': self._hot_frames(session.stacks, 5),
+            'allocations': [{'line': line, 'size_bytes': size}
+                            for line, size in allocations.most_common(5)],
+            'peak_traced_bytes': peak_bytes,
+        }
+
+    # --- Sampling ---
+    def _run(self):
+        while True:
+            self._wake.wait()
+            started = time.perf_counter()
+            self._sample()
+            time.sleep(max(self.interval - (time.perf_counter() - started), 0.0))
+
+    def _sample(self):
+        with self._lock:
+            targets = [(session, tuple(session.thread_ids)) for session in self._active]
+        if not targets:
+            return
+        frames = sys._current_frames()
+        sampled = [(session, stack_of(frames[thread_id], self.max_depth))
+                   for session, thread_ids in targets for thread_id in thread_ids if thread_id in frames]
+        del frames
+        with self._lock:
+            # A session finished since `targets` was read keeps the stacks it had.
+            for session, stack in sampled:
+                if session in self._active:
+                    session.stacks[stack] += 1
+            self._stats['samples'] += len(sampled)
+
+    # --- Allocations ---
+    def _start_allocations(self):
+        with self._lock:
+            if self._allocation_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(self.allocation_frames)
+                self._started_tracemalloc = True
+            self._allocation_users += 1
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        return snapshot, tracemalloc.get_traced_memory()[0]
+
+    def _finish_allocations(self, allocation_start):
+        """Net new allocations by line since `allocation_start`, and the peak above its baseline."""
+        start, baseline_bytes = allocation_start
+        peak_bytes = max(tracemalloc.get_traced_memory()[1] - baseline_bytes, 0)
+        end = tracemalloc.take_snapshot()
+        with self._lock:
+            self._allocation_users -= 1
+            if self._allocation_users == 0 and self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+        ignored = [tracemalloc.Filter(False, filename) for filename in _IGNORED_ALLOCATION_FILES]
+        allocations = Counter()
+        for stat in end.filter_traces(ignored).compare_to(start.filter_traces(ignored), 'lineno'):
+            if stat.size_diff > 0:
+                frame = stat.traceback[0]
+                allocations[f'{os.path.basename(frame.filename)}:{frame.lineno}'] += stat.size_diff
+        return allocations, peak_bytes
+
+    # --- Reports ---
+    @staticmethod
+    def _hot_frames(stacks, top):
+        """The frames most often on top of the stack (self) and anywhere in it (total)."""
+        total_samples = sum(stacks.values())
+        if not total_samples:
+            return []
+        self_counts, total_counts = Counter(), Counter()
+        for stack, count in stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+        return [{'frame': label, 'self_pct': round(100 * count / total_samples, 1),
+                 'total_pct': round(100 * total_counts[label] / total_samples, 1)}
+                for label, count in self_counts.most_common(top)]
+
+    def report(self, top=15):
+        with self._lock:
+            routes = {name: (route.requests, route.wall_ms, route.cpu_ms, Counter(route.stacks),
+                             Counter(route.spans), Counter(route.allocations), route.peak_bytes)
+                      for name, route in self._routes.items()}
+        report = {}
+        for name, (requests, wall_ms, cpu_ms, stacks, spans, allocations, peak_bytes) in routes.items():
+            report[name] = {
+                'requests': requests,
+                'avg_wall_ms': round(wall_ms / requests, 2),
+                'avg_cpu_ms': round(cpu_ms / requests, 2),
+                'samples': sum(stacks.values()),
+                'hot_frames': self._hot_frames(stacks, top),
+                'avg_span_ms': {span_name: round(total / requests, 2)
+                                for span_name, total in spans.most_common(top)},
+                'allocations': [{'line': line, 'size_bytes': size}
+                                for line, size in allocations.most_common(top)],
+                'max_peak_traced_bytes': peak_bytes,
+            }
+        return report
+
+    def folded(self):
+        """Collapsed stacks, `route;outer;...;inner count` per line."""
+        with self._lock:
+            lines = [f'{name};{";".join(stack)} {count}'
+                     for name, route in self._routes.items() for stack, count in route.stacks.items()]
+        return '\n'.join(sorted(lines)) + '\n' if lines else ''
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'active': len(self._active), 'routes': len(self._routes)}
@@ -0,0 +1,334 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f'Upstream endpoint {endpoint} is unavailable; retry in {retry_after:.0f}s')
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream endpoint.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls fail fast for `reset_timeout` seconds. The first call after that is
+    let through as a trial: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, endpoint, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (self._clock() - self._opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(self.endpoint, max(remaining, 1.0))
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+class CircuitBreakerRegistry:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def get(self, endpoint):
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+                self._breakers[endpoint] = breaker
+            return breaker
+
+    def states(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.endpoint: breaker.state for breaker in breakers}
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, attempts=3, base_delay=0.1, max_delay=2.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header; HTTP-date values are ignored."""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on in-flight requests; excess load is shed, not queued."""
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.shed = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_concurrent:
+                self.shed += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': self._in_flight, 'max_concurrent': self.max_concurrent,
+                    'shed': self.shed}
+
+
+class RateLimitedError(Exception):
+    """Raised instead of calling upstream when a token would take longer than the wait budget."""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(f'Upstream rate limit for {scope} reached; retry in {retry_after:.1f}s')
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def parse_rate_limit_headers(headers):
+    """(limit, remaining, reset_seconds) from RateLimit-* or X-RateLimit-* headers, or None."""
+    def header(name):
+        value = headers.get(f'RateLimit-{name}', headers.get(f'X-RateLimit-{name}'))
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    limit, remaining, reset = header('Limit'), header('Remaining'), header('Reset')
+    if remaining is None or reset is None:
+        return None
+    if reset > 1e9:
+        # Some APIs send the reset as an epoch timestamp rather than a delay.
+        reset -= time.time()
+    return limit, max(remaining, 0.0), max(reset, 0.0)
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts to what upstream reports.
+
+    `rate` starts at (and never exceeds) `max_rate`. A 429 halves it and
+    pauses the bucket for the Retry-After period; further 429s while the
+    bucket is paused come from calls already in flight and only extend the
+    pause. Quota headers set it to
+    the pace that spends the remaining quota evenly until the window
+    resets, or pause the bucket until then once the quota is spent; when
+    the window rolls over the rate becomes limit / window length. Without
+    quota headers each success adds back a twentieth of `max_rate`.
+    """
+
+    def __init__(self, max_rate, burst, min_rate=0.5, clock=time.monotonic):
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.rate = max_rate
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._quota_window = 0.0
+        self._quota_rate = None
+        self._quota_resets_at = None
+        self.admitted = 0
+        self.delayed = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.wait_total_ms = 0.0
+
+    def _clamp(self, rate):
+        return min(self.max_rate, max(self.min_rate, rate))
+
+    def _refill(self, now):
+        if self._quota_resets_at is not None and now >= self._quota_resets_at:
+            self.rate = self._clamp(self._quota_rate or self.max_rate)
+            self._quota_resets_at = None
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._updated = max(self._updated, now)
+
+    def wait_time(self, now):
+        """Seconds until a token is available, without taking it."""
+        self._refill(now)
+        wait = max(self._paused_until - now, 0.0)
+        if self._tokens < 1:
+            wait += (1 - self._tokens) / self.rate
+        return wait
+
+    def take(self, wait):
+        self._tokens -= 1
+        self.admitted += 1
+        if wait > 0:
+            self.delayed += 1
+            self.wait_total_ms += wait * 1000
+
+    def on_throttled(self, retry_after):
+        now = self._clock()
+        self._refill(now)
+        self.throttled += 1
+        if now >= self._paused_until:
+            self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        self._paused_until = max(self._paused_until, now + (retry_after or 1 / self.rate))
+
+    def on_quota(self, limit, remaining, reset):
+        now = self._clock()
+        self._refill(now)
+        self._quota_window = max(self._quota_window, reset)
+        if limit and self._quota_window:
+            self._quota_rate = limit / self._quota_window
+        self._quota_resets_at = now + reset
+        if remaining < 1:
+            self._paused_until = max(self._paused_until, now + reset)
+            self._tokens = min(self._tokens, 0.0)
+            self.rate = self._clamp(self._quota_rate or self.rate)
+        else:
+            if reset > 0:
+                self.rate = self._clamp(remaining / reset)
+            self._tokens = min(self._tokens, remaining)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def stats(self):
+        return {
+            'rate': round(self.rate, 2),
+            'max_rate': self.max_rate,
+            'tokens': round(self._tokens, 2),
+            'admitted': self.admitted,
+            'delayed': self.delayed,
+            'rejected': self.rejected,
+            'throttled': self.throttled,
+            'wait_total_ms': round(self.wait_total_ms, 2),
+        }
+
+
+class UpstreamRateLimiter:
+    """Client-side limit on upstream calls: one global bucket, one per on-behalf-of org.
+
+    `reserve` takes a token from both buckets and returns how long the
+    caller must wait before sending, or raises RateLimitedError if that
+    exceeds `max_wait`. `observe` feeds each response back into the global
+    bucket: MuralPay's quota belongs to the API key, so 429s and quota
+    headers describe every call, whichever org it was made for. The org
+    buckets stay at their fixed rate and only keep one org from using up
+    the shared quota. At most `max_orgs` org buckets are kept, least
+    recently used first out; a bucket idle for long has refilled to full,
+    so dropping it loses nothing.
+    """
+
+    def __init__(self, rate=100.0, burst=100, org_rate=25.0, org_burst=25, max_wait=5.0,
+                 max_orgs=1024, clock=time.monotonic):
+        self.org_rate = org_rate
+        self.org_burst = org_burst
+        self.max_wait = max_wait
+        self.max_orgs = max_orgs
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._global = TokenBucket(rate, burst, clock=clock)
+        self._orgs = OrderedDict()
+        self.evicted_orgs = 0
+
+    def _buckets(self, org_id):
+        if org_id is None:
+            return [self._global]
+        bucket = self._orgs.get(org_id)
+        if bucket is None:
+            bucket = self._orgs[org_id] = TokenBucket(self.org_rate, self.org_burst, clock=self._clock)
+            while len(self._orgs) > self.max_orgs:
+                self._orgs.popitem(last=False)
+                self.evicted_orgs += 1
+        else:
+            self._orgs.move_to_end(org_id)
+        return [self._global, bucket]
+
+    def reserve(self, org_id=None):
+        with self._lock:
+            now = self._clock()
+            buckets = self._buckets(org_id)
+            waits = [bucket.wait_time(now) for bucket in buckets]
+            wait = max(waits)
+            if wait > self.max_wait:
+                limiting = buckets[waits.index(wait)]
+                limiting.rejected += 1
+                raise RateLimitedError(org_id if limiting is not self._global else 'all organizations',
+                                       wait)
+            for bucket in buckets:
+                bucket.take(wait)
+            return wait
+
+    def observe(self, org_id, status_code, headers):
+        with self._lock:
+            if status_code == 429:
+                self._global.on_throttled(parse_retry_after(headers.get('Retry-After')))
+                return
+            quota = parse_rate_limit_headers(headers)
+            if quota is not None:
+                self._global.on_quota(*quota)
+            elif status_code < 500:
+                self._global.on_success()
+
+    def stats(self):
+        with self._lock:
+            return {'global': self._global.stats(),
+                    'org_buckets': len(self._orgs),
+                    'evicted_orgs': self.evicted_orgs,
+                    # Only the orgs whose own limit has turned calls away.
+                    'orgs': {org_id: bucket.stats() for org_id, bucket in self._orgs.items()
+                             if bucket.rejected}}
@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+# Seconds a cached upstream read stays fresh, keyed by endpoint name.
+DEFAULT_TTLS = {
+    'organization': 60.0,
+    'account': 30.0,
+    'account_list': 30.0,
+    'payout_history': 30.0,
+}
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'expires_at', 'stale_until')
+
+    def __init__(self, value, size, expires_at, stale_until):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class ResponseCache:
+    """Read-through LRU cache for upstream reads.
+
+    Keys are (endpoint, org_id, resource_id) tuples. Each endpoint has its own
+    TTL, and the cache evicts least recently used entries once the estimated
+    size of the cached values exceeds `max_bytes`. Expired entries are kept
+    for a further `stale_ttl` seconds so callers can fall back to them while
+    upstream is failing. Cached values are shared between callers and must be
+    treated as read-only.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, ttls=None, default_ttl=30.0,
+                 stale_ttl=0.0, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'stale_hits': 0, 'evictions': 0})
+
+    @staticmethod
+    def _estimate_size(value):
+        try:
+            return len(json.dumps(value, separators=(',', ':'), default=str))
+        except (TypeError, ValueError):
+            return len(repr(value))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, key):
+        """Return the fresh cached value for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() >= entry.expires_at:
+                self._stats[key[0]]['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats[key[0]]['hits'] += 1
+            return entry.value
+
+    def get_stale(self, key):
+        """Return the cached value for `key` even if expired, within the stale window."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() >= entry.stale_until:
+                return None
+            self._stats[key[0]]['stale_hits'] += 1
+            return entry.value
+
+    def set(self, key, value):
+        size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = self._clock() + self.ttls.get(key[0], self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, size, expires_at, expires_at + self.stale_ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key, _ = next(iter(self._entries.items()))
+                self._remove(evicted_key)
+                self._stats[evicted_key[0]]['evictions'] += 1
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, endpoint=None, org_id=None, resource_id=None):
+        """Drop every entry matching the given key parts; None matches anything."""
+        pattern = (endpoint, org_id, resource_id)
+        with self._lock:
+            stale = [key for key in self._entries
+                     if all(want is None or want == part for want, part in zip(pattern, key))]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'endpoints': {endpoint: dict(counts) for endpoint, counts in self._stats.items()},
+            }
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+
+from coalesce import SingleFlight
+from structured_logging import StructuredLogger
+
+logger = StructuredLogger(logging.getLogger(__name__))
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'refresh_at', 'refreshing')
+
+    def __init__(self, value, expires_at, refresh_at):
+        self.value = value
+        self.expires_at = expires_at
+        self.refresh_at = refresh_at
+        self.refreshing = False
+
+
+class SecretCache:
+    """Process-wide cache in front of Secret Manager.
+
+    One client is built lazily through `client_factory` and reused for every
+    lookup. Each secret is cached for its TTL; once it is within
+    `refresh_ahead` seconds of expiring, the next read kicks off a background
+    refresh while still returning the cached value. Concurrent misses for the
+    same secret share a single fetch.
+
+    `client_factory` only needs to return an object exposing
+    `access_secret_version(request={"name": ...})`, so a fake client can be
+    swapped in for local runs.
+    """
+
+    def __init__(self, client_factory, project_id, default_ttl=300.0,
+                 refresh_ahead=60.0, ttls=None, clock=time.monotonic):
+        self._client_factory = client_factory
+        self._client = None
+        self.project_id = project_id
+        self.default_ttl = default_ttl
+        self.refresh_ahead = refresh_ahead
+        self.ttls = dict(ttls or {})
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = SingleFlight()
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def _ttl_for(self, secret_id):
+        return self.ttls.get(secret_id, self.default_ttl)
+
+    def _fetch(self, secret_id):
+        name = f'projects/{self.project_id}/secrets/{secret_id}/versions/latest'
+        response = self._get_client().access_secret_version(request={"name": name})
+        return response.payload.data.decode("UTF-8").strip()
+
+    def _load(self, secret_id):
+        """Fetch `secret_id`, sharing the round trip with concurrent callers."""
+        return self._inflight.do(secret_id, lambda: self._fetch_and_store(secret_id))
+
+    def _fetch_and_store(self, secret_id):
+        value = self._fetch(secret_id)
+        ttl = self._ttl_for(secret_id)
+        now = self._clock()
+        entry = _Entry(value, now + ttl, now + max(ttl - self.refresh_ahead, 0))
+        with self._lock:
+            self._entries[secret_id] = entry
+        return value
+
+    def _refresh(self, secret_id, entry):
+        try:
+            self._load(secret_id)
+            logger.debug('Secret refreshed in background', secret_id=secret_id)
+        except Exception as e:
+            # Keep serving the cached value until it actually expires.
+            logger.warning('Background secret refresh failed',
+                           secret_id=secret_id,
+                           error=str(e),
+                           error_type=type(e).__name__)
+        finally:
+            entry.refreshing = False
+
+    def peek(self, secret_id):
+        """Return the cached secret without blocking, or None on a miss."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(secret_id)
+            if entry is None or now >= entry.expires_at:
+                return None
+            if now >= entry.refresh_at and not entry.refreshing:
+                entry.refreshing = True
+                threading.Thread(target=self._refresh,
+                                 args=(secret_id, entry),
+                                 daemon=True).start()
+            return entry.value
+
+    def get(self, secret_id):
+        value = self.peek(secret_id)
+        if value is None:
+            value = self._load(secret_id)
+        return value
+
+    def invalidate(self, secret_id=None):
+        """Drop one cached secret, or all of them when no id is given."""
+        with self._lock:
+            if secret_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(secret_id, None)
@@ -0,0 +1,50 @@
+"""JSON encoding and decoding for responses, upstream bodies and logs.
+
+orjson is used when it is installed, the stdlib json module otherwise. Both
+produce compact UTF-8 output and fall back to str() for values JSON has no
+type for. `set_backend` switches at runtime so the two can be compared.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+BACKENDS = ('orjson', 'stdlib') if orjson is not None else ('stdlib',)
+
+backend = BACKENDS[0]
+
+_stdlib_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def set_backend(name):
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(f'JSON backend {name!r} is not available; choose from {BACKENDS}')
+    backend = name
+
+
+def dumps_bytes(value):
+    """Encode `value` as UTF-8 JSON bytes."""
+    if backend == 'orjson':
+        try:
+            return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # e.g. integers wider than 64 bits; the stdlib encoder copes.
+            pass
+    return _stdlib_encoder.encode(value).encode()
+
+
+def dumps(value):
+    """Encode `value` as a JSON string."""
+    if backend == 'orjson':
+        return dumps_bytes(value).decode()
+    return _stdlib_encoder.encode(value)
+
+
+def loads(data):
+    """Decode JSON from str or bytes."""
+    if backend == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
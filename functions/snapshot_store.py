@@ -0,0 +1,250 @@
+import logging
+import sqlite3
+import threading
+import time
+
+import serialization
+from coalesce import SingleFlight
+from structured_logging import StructuredLogger
+from tracing import span
+
+logger = StructuredLogger(logging.getLogger(__name__))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS organizations (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    id TEXT PRIMARY KEY,
+    org_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS accounts_by_org ON accounts (org_id, position);
+CREATE TABLE IF NOT EXISTS payouts (
+    id TEXT PRIMARY KEY,
+    org_id TEXT NOT NULL,
+    source_account_id TEXT,
+    status TEXT,
+    position INTEGER NOT NULL,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payouts_by_account ON payouts (org_id, source_account_id, position);
+CREATE INDEX IF NOT EXISTS payouts_by_status ON payouts (org_id, status, position);
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL,
+    records INTEGER NOT NULL,
+    changed INTEGER NOT NULL
+);
+'''
+
+# Per table: extra indexed columns pulled from each record, and whether rows belong to an org.
+_TABLES = {
+    'organizations': ((), False),
+    'accounts': ((), True),
+    'payouts': ((('source_account_id', 'sourceAccountId'), ('status', 'status')), True),
+}
+
+
+def scope_key(kind, org_id=None):
+    return kind if org_id is None else f'{kind}:{org_id}'
+
+
+class SnapshotStore:
+    """SQLite snapshot of organizations, accounts and payouts.
+
+    Each scope (the organization list, or one org's accounts or payouts) is
+    refreshed by `sync`, which walks the full upstream listing but only
+    rewrites rows whose `updatedAt` changed (unchanged rows at most get their
+    listing position updated) and drops rows that disappeared. Reads go
+    through `ensure_fresh`: a scope older than `max_staleness` seconds keeps
+    being served while a background thread re-syncs it, and only one never
+    synced, or older than `max_serve_staleness`, is synced before the read.
+    Concurrent syncs of one scope share a walk.
+    """
+
+    def __init__(self, path, max_staleness=60.0, max_serve_staleness=600.0, clock=time.time):
+        self.path = path
+        self.max_staleness = max_staleness
+        self.max_serve_staleness = max(max_serve_staleness, max_staleness)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = None
+        self._syncs = SingleFlight()
+        self._refreshing = set()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.execute('PRAGMA synchronous=NORMAL')
+                    conn.executescript(_SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    def _query(self, sql, params=()):
+        conn = self.conn
+        with self._lock:
+            return conn.execute(sql, params).fetchall()
+
+    # --- Sync ---
+    def synced_at(self, scope):
+        rows = self._query('SELECT synced_at FROM sync_state WHERE scope = ?', (scope,))
+        return rows[0][0] if rows else None
+
+    def is_fresh(self, scope):
+        synced_at = self.synced_at(scope)
+        return synced_at is not None and self._clock() - synced_at < self.max_staleness
+
+    def ensure_fresh(self, kind, org_id, fetch):
+        """Make the scope servable, syncing it from `fetch()` inline or in the background.
+
+        Returns True if the caller waited for a sync.
+        """
+        scope = scope_key(kind, org_id)
+        synced_at = self.synced_at(scope)
+        age = None if synced_at is None else self._clock() - synced_at
+        if age is not None and age < self.max_staleness:
+            return False
+        if age is not None and age < self.max_serve_staleness:
+            self._refresh_in_background(kind, org_id, fetch)
+            return False
+        self._sync_once(kind, org_id, fetch)
+        return True
+
+    def _sync_once(self, kind, org_id, fetch):
+        scope = scope_key(kind, org_id)
+        self._syncs.do(scope, lambda: self.is_fresh(scope) or self.sync(kind, org_id, fetch()))
+
+    def _refresh_in_background(self, kind, org_id, fetch):
+        scope = scope_key(kind, org_id)
+        with self._lock:
+            if scope in self._refreshing:
+                return
+            self._refreshing.add(scope)
+        threading.Thread(target=self._refresh, args=(kind, org_id, fetch), daemon=True).start()
+
+    def _refresh(self, kind, org_id, fetch):
+        scope = scope_key(kind, org_id)
+        try:
+            self._sync_once(kind, org_id, fetch)
+        except Exception as e:
+            # The old snapshot keeps being served until it passes max_serve_staleness.
+            logger.warning('Background snapshot refresh failed',
+                           scope=scope,
+                           error=str(e),
+                           error_type=type(e).__name__)
+        finally:
+            with self._lock:
+                self._refreshing.discard(scope)
+
+    def sync(self, kind, org_id, records):
+        """Apply a full upstream listing for one scope, writing only what changed."""
+        extra_columns, per_org = _TABLES[kind]
+        scope = scope_key(kind, org_id)
+        columns = ['id', 'position', 'updated_at', 'data', *(['org_id'] if per_org else []),
+                   *(column for column, _ in extra_columns)]
+        upsert = (f'INSERT INTO {kind} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))}) '
+                  f'ON CONFLICT(id) DO UPDATE SET '
+                  + ', '.join(f'{column} = excluded.{column}' for column in columns[1:]))
+        where, params = ('WHERE org_id = ?', (org_id,)) if per_org else ('', ())
+
+        with span('snapshot.sync', scope=scope) as record:
+            conn = self.conn
+            with self._lock:
+                stored = {row[0]: row[1:] for row in conn.execute(
+                    f'SELECT id, updated_at, position FROM {kind} {where}', params)}
+            seen = set()
+            changed = []
+            moved = []
+            for position, item in enumerate(records):
+                seen.add(item['id'])
+                updated_at = item.get('updatedAt')
+                previous = stored.get(item['id'])
+                if updated_at is not None and previous is not None and previous[0] == updated_at:
+                    # Unchanged record: at most its place in the listing moved.
+                    if previous[1] != position:
+                        moved.append((position, item['id']))
+                    continue
+                changed.append((item['id'], position, updated_at, serialization.dumps(item),
+                                *([org_id] if per_org else []),
+                                *(item.get(field) for _, field in extra_columns)))
+            removed = [(record_id,) for record_id in stored if record_id not in seen]
+
+            with self._lock:
+                conn.execute('BEGIN')
+                try:
+                    conn.executemany(upsert, changed)
+                    conn.executemany(f'UPDATE {kind} SET position = ? WHERE id = ?', moved)
+                    conn.executemany(f'DELETE FROM {kind} WHERE id = ?', removed)
+                    conn.execute('INSERT OR REPLACE INTO sync_state (scope, synced_at, records, changed) '
+                                 'VALUES (?, ?, ?, ?)',
+                                 (scope, self._clock(), len(seen), len(changed)))
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+            record.attributes.update(records=len(seen), changed=len(changed), moved=len(moved),
+                                     removed=len(removed))
+        return {'records': len(seen), 'changed': len(changed), 'moved': len(moved),
+                'removed': len(removed)}
+
+    def expire(self, kind, org_id=None):
+        """Force the next read of a scope to re-sync, e.g. after a write through the API.
+
+        The rows stay, so they can still be served stale if that sync fails.
+        """
+        conn = self.conn
+        with self._lock:
+            conn.execute('UPDATE sync_state SET synced_at = 0 WHERE scope = ?', (scope_key(kind, org_id),))
+
+    # --- Reads ---
+    @staticmethod
+    def _decode(rows):
+        return [serialization.loads(row[0]) for row in rows]
+
+    def organizations(self):
+        return self._decode(self._query('SELECT data FROM organizations ORDER BY position'))
+
+    def accounts(self, org_id):
+        return self._decode(self._query(
+            'SELECT data FROM accounts WHERE org_id = ? ORDER BY position', (org_id,)))
+
+    def account(self, org_id, account_id):
+        rows = self._query('SELECT data FROM accounts WHERE org_id = ? AND id = ?', (org_id, account_id))
+        return self._decode(rows)[0] if rows else None
+
+    def payouts(self, org_id, account_id, statuses=None, offset=0, limit=50):
+        """One page of an account's payouts in upstream order, plus the next offset or None.
+
+        `limit=None` returns every matching payout from `offset` on.
+        """
+        sql = 'SELECT data FROM payouts WHERE org_id = ? AND source_account_id = ?'
+        params = [org_id, account_id]
+        if statuses:
+            sql += f' AND status IN ({", ".join("?" * len(statuses))})'
+            params += list(statuses)
+        sql += ' ORDER BY position LIMIT ? OFFSET ?'
+        rows = self._query(sql, (*params, -1 if limit is None else limit + 1, offset))
+        if limit is None:
+            return self._decode(rows), None
+        next_offset = offset + limit if len(rows) > limit else None
+        return self._decode(rows[:limit]), next_offset
+
+    def stats(self):
+        rows = self._query('SELECT scope, synced_at, records, changed FROM sync_state')
+        now = self._clock()
+        with self._lock:
+            refreshing = set(self._refreshing)
+        return {scope: {'age_seconds': round(now - synced_at, 1), 'records': records,
+                        'changed': changed, 'refreshing': scope in refreshing}
+                for scope, synced_at, records, changed in rows}
@@ -0,0 +1,92 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+
+from serialization import dumps as encode_json
+from tracing import current_correlation_id
+
+_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+}
+
+class StructuredLogger:
+    """JSON-per-line logger with lazy, size-capped fields.
+
+    Nothing is built or serialized for a disabled level. Keyword values may
+    be zero-argument callables, which are only invoked when the record is
+    actually emitted. Each field is capped at `max_field_bytes` once encoded.
+    """
+
+    def __init__(self, logger, max_field_bytes=4096, payload_sample_rate=1.0):
+        self.logger = logger
+        self.max_field_bytes = max_field_bytes
+        self.payload_sample_rate = payload_sample_rate
+        self._lock = threading.Lock()
+        self._stats = {'emitted': 0, 'skipped': 0, 'truncated': 0, 'encode_ms': 0.0}
+
+    def sample_payload(self):
+        """Whether this request's headers/bodies should be logged."""
+        return self.payload_sample_rate >= 1.0 or random.random() < self.payload_sample_rate
+
+    def _encode_field(self, value):
+        if callable(value):
+            value = value()
+        encoded = encode_json(value)
+        if len(encoded) <= self.max_field_bytes:
+            return encoded, False
+        return encode_json({
+            'truncated': True,
+            'size_bytes': len(encoded),
+            'preview': encoded[:self.max_field_bytes]
+        }), True
+
+    def _log(self, level, msg, **kwargs):
+        if not self.logger.isEnabledFor(_LEVELS[level]):
+            with self._lock:
+                self._stats['skipped'] += 1
+            return
+
+        start = time.perf_counter()
+        fields = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'message': msg,
+            # Background workers (secret refresh, thread pools) log outside
+            # of a Flask app context, where touching `g` would raise.
+            'correlation_id': current_correlation_id() or 'N/A',
+            **kwargs
+        }
+        truncated = 0
+        parts = []
+        for key, value in fields.items():
+            encoded, was_truncated = self._encode_field(value)
+            truncated += was_truncated
+            parts.append(f'{encode_json(key)}: {encoded}')
+        line = '{' + ', '.join(parts) + '}'
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats['emitted'] += 1
+            self._stats['truncated'] += truncated
+            self._stats['encode_ms'] += elapsed_ms
+        self.logger.log(_LEVELS[level], line)
+
+    def info(self, msg, **kwargs):
+        self._log('info', msg, **kwargs)
+
+    def error(self, msg, **kwargs):
+        self._log('error', msg, **kwargs)
+
+    def debug(self, msg, **kwargs):
+        self._log('debug', msg, **kwargs)
+
+    def warning(self, msg, **kwargs):
+        self._log('warning', msg, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'encode_ms': round(self._stats['encode_ms'], 3)}
@@ -0,0 +1,90 @@
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_app_context
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - optional dependency
+    otel_trace = None
+
+CORRELATION_HEADER = 'X-Correlation-Id'
+
+# Request-scoped state for code serving outside a Flask app context (the
+# asyncio serving mode). Tasks spawned by a request inherit both values.
+request_trace = ContextVar('request_trace', default=None)
+request_correlation_id = ContextVar('request_correlation_id', default=None)
+
+_tracer = None
+if otel_trace is not None and os.environ.get('OTEL_TRACING_ENABLED', 'false').lower() == 'true':
+    # Spans go to whatever tracer provider the runtime configured; with only
+    # opentelemetry-api installed this is a no-op.
+    _tracer = otel_trace.get_tracer('mural-take-home-functions')
+
+
+class Span:
+    __slots__ = ('name', 'start', 'duration_ms', 'attributes')
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.attributes = attributes
+
+    def as_dict(self):
+        return {'name': self.name, 'duration_ms': self.duration_ms, **self.attributes}
+
+
+def current_trace():
+    """The span list for the current request, or None outside a request."""
+    if not has_app_context():
+        return request_trace.get()
+    if 'trace' not in g:
+        g.trace = []
+    return g.trace
+
+
+def current_correlation_id():
+    return g.get('correlation_id') if has_app_context() else request_correlation_id.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block and record it on the current request's trace."""
+    record = Span(name, attributes)
+    otel_cm = _tracer.start_as_current_span(name, attributes=attributes) if _tracer else None
+    if otel_cm is not None:
+        otel_cm.__enter__()
+    try:
+        yield record
+    finally:
+        record.duration_ms = round((time.perf_counter() - record.start) * 1000, 2)
+        if otel_cm is not None:
+            otel_cm.__exit__(None, None, None)
+        trace = current_trace()
+        if trace is not None:
+            # list.append is atomic, so fan-out workers sharing g.trace are safe.
+            trace.append(record)
+
+
+def summarize(spans):
+    """Total duration and count per span name, in first-seen order."""
+    summary = OrderedDict()
+    for record in spans or ():
+        if record.duration_ms is None:
+            continue
+        total, count = summary.get(record.name, (0.0, 0))
+        summary[record.name] = (total + record.duration_ms, count + 1)
+    return summary
+
+
+def server_timing(spans, total_ms=None):
+    """Build a Server-Timing header value from a request's spans."""
+    entries = [f'{name};dur={total:.2f};desc="x{count}"' if count > 1 else f'{name};dur={total:.2f}'
+               for name, (total, count) in summarize(spans).items()]
+    if total_ms is not None:
+        entries.append(f'total;dur={total_ms:.2f}')
+    return ', '.join(entries)
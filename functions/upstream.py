@@ -0,0 +1,350 @@
+import asyncio
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import serialization
+from resilience import CircuitBreakerRegistry, RetryPolicy, parse_retry_after
+from tracing import CORRELATION_HEADER, current_correlation_id, span
+
+
+class PoolMetrics:
+    """Counters for connection reuse and time spent waiting on the pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.pool_wait_total_ms = 0.0
+        self.pool_wait_max_ms = 0.0
+
+    def record_checkout(self, wait_ms):
+        with self._lock:
+            self.requests += 1
+            self.pool_wait_total_ms += wait_ms
+            self.pool_wait_max_ms = max(self.pool_wait_max_ms, wait_ms)
+
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused_connections': reused,
+                'reuse_ratio': round(reused / self.requests, 4) if self.requests else 0.0,
+                'pool_wait_total_ms': round(self.pool_wait_total_ms, 2),
+                'pool_wait_max_ms': round(self.pool_wait_max_ms, 2),
+            }
+
+
+def _metered_pool(base):
+    class MeteredPool(base):
+        metrics = None
+
+        def _get_conn(self, timeout=None):
+            start = time.perf_counter()
+            conn = super()._get_conn(timeout=timeout)
+            if self.metrics is not None:
+                self.metrics.record_checkout((time.perf_counter() - start) * 1000)
+            return conn
+
+        def _new_conn(self):
+            if self.metrics is not None:
+                self.metrics.record_new_connection()
+            return super()._new_conn()
+
+    MeteredPool.__name__ = f'Metered{base.__name__}'
+    return MeteredPool
+
+
+class MeteredHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report into a PoolMetrics."""
+
+    def __init__(self, metrics, **kwargs):
+        self.metrics = metrics
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pool_classes = {}
+        for scheme, base in (('http', HTTPConnectionPool), ('https', HTTPSConnectionPool)):
+            pool_cls = _metered_pool(base)
+            pool_cls.metrics = self.metrics
+            pool_classes[scheme] = pool_cls
+        self.poolmanager.pool_classes_by_scheme = pool_classes
+
+
+# (connect, read) timeouts in seconds, keyed by logical endpoint name.
+DEFAULT_TIMEOUTS = {
+    'organization': (3.05, 10),
+    'organization_search': (3.05, 15),
+    'organization_create': (3.05, 15),
+    'tos_link': (3.05, 10),
+    'kyc_link': (3.05, 10),
+    'account': (3.05, 10),
+    'account_list': (3.05, 10),
+    'account_create': (3.05, 15),
+    'payout_create': (3.05, 30),
+    'payout_execute': (3.05, 30),
+    'payout_search': (3.05, 30),
+}
+
+# POST endpoints that only read and are therefore safe to retry.
+IDEMPOTENT_POSTS = {'organization_search', 'payout_search'}
+
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+class UpstreamClient:
+    """Shared, keep-alive HTTP client for the MuralPay API.
+
+    The underlying `requests.Session` is built on first use and kept for the
+    life of the process, so a warm instance reuses its TLS connections to the
+    API host instead of handshaking on every call.
+
+    Every endpoint sits behind its own circuit breaker. Idempotent calls
+    (GETs and the search POSTs) are retried with jittered backoff on
+    connection errors, timeouts and retryable statuses; writes never are.
+    With a `rate_limiter`, each attempt first waits for a token (global and
+    for its on-behalf-of org) and every response is fed back to it.
+    """
+
+    def __init__(self, base_url, pool_connections=4, pool_maxsize=32,
+                 pool_block=True, timeouts=None, default_timeout=(3.05, 30),
+                 retry_policy=None, breakers=None, rate_limiter=None):
+        self.base_url = base_url.rstrip('/')
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.default_timeout = default_timeout
+        self.metrics = PoolMetrics()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breakers = breakers or CircuitBreakerRegistry()
+        self.rate_limiter = rate_limiter
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = MeteredHTTPAdapter(self.metrics,
+                                                 pool_connections=self.pool_connections,
+                                                 pool_maxsize=self.pool_maxsize,
+                                                 pool_block=self.pool_block)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    @staticmethod
+    def headers(api_key, org_id=None, **extra):
+        headers = {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "authorization": f"Bearer {api_key}"
+        }
+        if org_id is not None:
+            headers["on-behalf-of"] = org_id
+        headers.update(extra)
+        return headers
+
+    def timeout_for(self, endpoint):
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    def is_idempotent(self, method, endpoint):
+        return method == 'GET' or endpoint in IDEMPOTENT_POSTS
+
+    def rate_limit_wait(self, endpoint, org_id):
+        """Seconds to wait for a rate limit token before sending; raises RateLimitedError."""
+        return self.rate_limiter.reserve(org_id) if self.rate_limiter is not None else 0.0
+
+    def observe(self, org_id, response):
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(org_id, response.status_code, response.headers)
+
+    def _send(self, method, endpoint, path, json, params, headers):
+        with span(f'upstream.{endpoint}', method=method, path=path) as record:
+            response = self.session.request(method,
+                                            self.url(path),
+                                            json=json,
+                                            params=params,
+                                            headers=headers,
+                                            timeout=self.timeout_for(endpoint))
+            record.attributes['status_code'] = response.status_code
+            return response
+
+    def request(self, method, endpoint, path, api_key, org_id=None,
+                json=None, params=None, headers=None):
+        request_headers = self.headers(api_key, org_id, **(headers or {}))
+        correlation_id = current_correlation_id()
+        if correlation_id:
+            request_headers[CORRELATION_HEADER] = correlation_id
+        breaker = self.breakers.get(endpoint)
+        attempts = self.retry_policy.attempts if self.is_idempotent(method, endpoint) else 1
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            wait = self.rate_limit_wait(endpoint, org_id)
+            if wait > 0:
+                with span('ratelimit.wait', endpoint=endpoint):
+                    time.sleep(wait)
+            breaker.before_call()
+            try:
+                response = self._send(method, endpoint, path, json, params, request_headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                breaker.record_failure()
+                if last_attempt:
+                    raise
+                time.sleep(self.retry_policy.delay(attempt))
+                continue
+            except Exception:
+                # Anything else (a broken chunked body, a redirect loop) still
+                # has to end a half-open trial, or the breaker stays stuck open.
+                breaker.record_failure()
+                raise
+
+            self.observe(org_id, response)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRYABLE_STATUSES or last_attempt:
+                return response
+            time.sleep(self.retry_policy.delay(
+                attempt, parse_retry_after(response.headers.get('Retry-After'))))
+
+    def get(self, endpoint, path, api_key, org_id=None, **kwargs):
+        return self.request('GET', endpoint, path, api_key, org_id, **kwargs)
+
+    def post(self, endpoint, path, api_key, org_id=None, **kwargs):
+        return self.request('POST', endpoint, path, api_key, org_id, **kwargs)
+
+    @staticmethod
+    def decode(response):
+        """Parse a response body as JSON, timed as its own span."""
+        with span('json.decode'):
+            return serialization.loads(response.content)
+
+    def stats(self):
+        return {**self.metrics.snapshot(), 'circuits': self.breakers.states(),
+                'rate_limits': self.rate_limiter.stats() if self.rate_limiter is not None else None}
+
+
+class AsyncUpstreamClient:
+    """asyncio counterpart of UpstreamClient built on a shared httpx.AsyncClient.
+
+    Same endpoint names, timeouts, headers, retry policy and circuit breaker
+    semantics; waiting on MuralPay yields to the event loop instead of
+    holding a worker thread.
+    """
+
+    def __init__(self, base_url, max_connections=100, timeouts=None,
+                 default_timeout=(3.05, 30), retry_policy=None, breakers=None, rate_limiter=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.default_timeout = default_timeout
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breakers = breakers or CircuitBreakerRegistry()
+        self.rate_limiter = rate_limiter
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections))
+        return self._client
+
+    url = UpstreamClient.url
+    headers = staticmethod(UpstreamClient.headers)
+    is_idempotent = UpstreamClient.is_idempotent
+    rate_limit_wait = UpstreamClient.rate_limit_wait
+    observe = UpstreamClient.observe
+
+    def timeout_for(self, endpoint):
+        import httpx
+
+        connect, read = self.timeouts.get(endpoint, self.default_timeout)
+        return httpx.Timeout(read, connect=connect)
+
+    async def request(self, method, endpoint, path, api_key, org_id=None,
+                      json=None, params=None, headers=None):
+        import httpx
+
+        request_headers = self.headers(api_key, org_id, **(headers or {}))
+        correlation_id = current_correlation_id()
+        if correlation_id:
+            request_headers[CORRELATION_HEADER] = correlation_id
+        breaker = self.breakers.get(endpoint)
+        attempts = self.retry_policy.attempts if self.is_idempotent(method, endpoint) else 1
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            wait = self.rate_limit_wait(endpoint, org_id)
+            if wait > 0:
+                with span('ratelimit.wait', endpoint=endpoint):
+                    await asyncio.sleep(wait)
+            breaker.before_call()
+            try:
+                with span(f'upstream.{endpoint}', method=method, path=path) as record:
+                    response = await self.client.request(method, self.url(path),
+                                                         json=json, params=params,
+                                                         headers=request_headers,
+                                                         timeout=self.timeout_for(endpoint))
+                    record.attributes['status_code'] = response.status_code
+            except httpx.TransportError:
+                breaker.record_failure()
+                if last_attempt:
+                    raise
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                continue
+            except BaseException:
+                # Any other error, or the task being cancelled, still has to
+                # end a half-open trial, or the breaker stays stuck open.
+                breaker.record_failure()
+                raise
+
+            self.observe(org_id, response)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRYABLE_STATUSES or last_attempt:
+                return response
+            await asyncio.sleep(self.retry_policy.delay(
+                attempt, parse_retry_after(response.headers.get('Retry-After'))))
+
+    async def get(self, endpoint, path, api_key, org_id=None, **kwargs):
+        return await self.request('GET', endpoint, path, api_key, org_id, **kwargs)
+
+    async def post(self, endpoint, path, api_key, org_id=None, **kwargs):
+        return await self.request('POST', endpoint, path, api_key, org_id, **kwargs)
+
+    decode = staticmethod(UpstreamClient.decode)
+
+    def stats(self):
+        return {'max_connections': self.max_connections, 'circuits': self.breakers.states(),
+                'rate_limits': self.rate_limiter.stats() if self.rate_limiter is not None else None}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
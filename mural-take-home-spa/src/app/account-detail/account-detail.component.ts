@@ -78,7 +78,7 @@ export class AccountDetailComponent implements OnInit {
     };
 
     console.log('Loading payouts with payload:', basePayload);
-    this.payoutService.getPayoutData(this.orgId, this.accountId, basePayload).subscribe({
+    this.payoutService.streamPayoutData(this.orgId, this.accountId, basePayload).subscribe({
       next: (data: Payout[]) => {
         console.log('Received payouts data:', data);
         this.payouts = data;
@@ -1,9 +1,5 @@
 import { Component, OnInit } from '@angular/core';
 import { AccountsService } from '../services/accounts.service';
-import { OrganizationService } from '../services/organization.service';
-import { getOrgIdsWithCaching } from '../../utility_functions';
-import { forkJoin, of } from 'rxjs';
-import { catchError } from 'rxjs/operators';
 import { CommonModule } from '@angular/common';
 import { MatCardModule } from '@angular/material/card';
 import { MatTableModule } from '@angular/material/table';
@@ -24,46 +20,29 @@ export class AccountsComponent implements OnInit {
   orgIds: string[] = [];
   orgs: any[] = [];
 
-  constructor(
-    private accountsService: AccountsService,
-    private organizationService: OrganizationService
-  ) {}
+  constructor(private accountsService: AccountsService) {}
 
-  async ngOnInit(): Promise<void> {
+  ngOnInit(): void {
     this.loading = true;
 
-    try {
-      const orgs = await getOrgIdsWithCaching(this.organizationService);
-      const orgIds = orgs.map((org: { id: string }) => org.id);
-      this.orgIds = orgIds;
-      this.orgs = orgs;
-
-      const calls = orgIds.map((orgId) =>
-        this.accountsService.getAccountListData(orgId).pipe(
-          catchError((err) => {
-            console.error(`Failed to fetch accounts for ${orgId}`, err);
-            return of([]);
-          })
-        )
-      );
-
-      forkJoin(calls).subscribe({
-        next: (results) => {
-          results.forEach((accounts, i) => {
-            const orgName = orgs[i].name;
-            const orgId = orgIds[i];
-            this.groupedAccounts[orgId] = accounts;
-          });
-          this.loading = false;
-        },
-        error: (err) => {
-          console.error('Unexpected error loading accounts:', err);
-          this.loading = false;
-        },
-      });
-    } catch (err) {
-      console.error('Could not load org IDs:', err);
-      this.loading = false;
-    }
+    // One backend call returns every organization's accounts; organizations
+    // without accounts are dropped server-side.
+    this.accountsService.getAccountsByOrganization(true).subscribe({
+      next: (groups) => {
+        groups.forEach((group) => {
+          if (group.error) {
+            console.error(`Failed to fetch accounts for ${group.organization.id}`, group.error);
+          }
+          this.groupedAccounts[group.organization.id] = group.accounts;
+        });
+        this.orgs = groups.map((group) => group.organization);
+        this.orgIds = this.orgs.map((org) => org.id);
+        this.loading = false;
+      },
+      error: (err) => {
+        console.error('Unexpected error loading accounts:', err);
+        this.loading = false;
+      },
+    });
   }
 }
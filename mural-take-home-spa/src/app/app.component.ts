@@ -32,8 +32,8 @@ export class AppComponent {
   ngOnInit(): void {
     this.ipInfoService.getIpInfo().subscribe({
       next: (data) => {
-        this.userLocation = `${data.city}, ${data.region}, ${data.country}`;
-        if(this.ipInfoService.isCountryRestricted(data.country)){
+        this.userLocation = data.country || 'Location unavailable';
+        if(data.restricted){
           this.userWarning = 'WARNING: User in Restricted Country';
         }
       },
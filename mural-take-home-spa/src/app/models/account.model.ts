@@ -29,4 +29,14 @@ export interface Account {
       };
     };
   }
-  
\ No newline at end of file
+  
+  export interface AccountGroup {
+    organization: {
+      id: string;
+      name?: string;
+      firstName?: string;
+      lastName?: string;
+    };
+    accounts: Account[];
+    error?: string;
+  }
@@ -0,0 +1,14 @@
+export interface BatchRequest {
+  id: string;
+  method?: 'GET' | 'POST';
+  path: string;
+  body?: any;
+  headers?: Record<string, string>;
+}
+
+export interface BatchResponse<T = any> {
+  id: string;
+  status: number;
+  headers: Record<string, string>;
+  body: T;
+}
@@ -9,6 +9,7 @@ export interface Organization {
       kycUrl?: string;
     };
     tosStatus: string;
+    enrichmentError?: string;
     currencyCapabilities: CurrencyCapability[];
   }
   
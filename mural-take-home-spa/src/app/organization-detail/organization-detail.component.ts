@@ -1,7 +1,7 @@
 import { Component, OnInit } from '@angular/core';
 import { ActivatedRoute, RouterLink } from '@angular/router';
-import { OrganizationService } from '../services/organization.service';
 import { AccountsService } from '../services/accounts.service';
+import { BatchService } from '../services/batch.service';
 import { Organization } from '../models/organization.model';
 import { Account } from '../models/account.model';
 import { MatProgressSpinnerModule } from '@angular/material/progress-spinner';
@@ -10,7 +10,6 @@ import { MatCardModule } from '@angular/material/card';
 import { MatToolbarModule } from '@angular/material/toolbar';
 import { MatTableModule } from '@angular/material/table';
 import { MatIconModule } from '@angular/material/icon';
-import { forkJoin } from 'rxjs';
 import { MatDialog } from '@angular/material/dialog';
 import { CreateAccountDialogComponent } from '../dialogs/create-account-dialog.component';
 
@@ -42,8 +41,8 @@ export class OrganizationDetailComponent implements OnInit {
 
   constructor(
     private readonly route: ActivatedRoute,
-    private readonly organizationService: OrganizationService,
     private readonly accountsService: AccountsService,
+    private readonly batchService: BatchService,
     private dialog: MatDialog
   ) {}
 
@@ -51,23 +50,28 @@ export class OrganizationDetailComponent implements OnInit {
     const id = this.route.snapshot.paramMap.get('id');
     if (!id) return;
   
-    this.organizationService.getOrganizationData(id).subscribe({
-      next: (organization) => {
-        this.organization = organization;
-        const tosAccepted = organization.tosStatus === 'ACCEPTED';
-        const kycApproved = organization.kycStatus?.type === 'approved';
-  
-        if (tosAccepted && kycApproved) {
-          this.accountsService.getAccountListData(id).subscribe({
-            next: (accounts) => {
-              this.accounts = accounts;
-            },
-            error: (err) =>
-              console.error('Failed to load accounts:', err),
-          });
+    // Organization and accounts come back together from one batch call
+    this.batchService.execute([
+      { id: 'organization', path: `/api/organizations/${id}` },
+      { id: 'accounts', path: `/api/accounts/${id}` },
+    ]).subscribe({
+      next: (responses) => {
+        const { organization, accounts } = responses;
+        if (organization.status !== 200) {
+          console.error('Failed to load organization:', organization.body);
+          return;
+        }
+        this.organization = organization.body as Organization;
+        const tosAccepted = this.organization.tosStatus === 'ACCEPTED';
+        const kycApproved = this.organization.kycStatus?.type === 'approved';
+
+        if (!tosAccepted || !kycApproved) {
+          console.warn('TOS not accepted or KYC not approved — not showing accounts.');
+          this.accounts = [];
+        } else if (accounts.status !== 200) {
+          console.error('Failed to load accounts:', accounts.body);
         } else {
-          console.warn('TOS not accepted or KYC not approved — skipping accounts fetch.');
-          this.accounts = []; // Optional: clear or default state
+          this.accounts = accounts.body as Account[];
         }
       },
       error: (err) =>
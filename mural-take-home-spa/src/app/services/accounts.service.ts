@@ -1,7 +1,7 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http'
 import { Observable } from 'rxjs'
-import { Account } from '../models/account.model';
+import { Account, AccountGroup } from '../models/account.model';
 
 @Injectable({
   providedIn: 'root'
@@ -16,6 +16,13 @@ export class AccountsService {
     return this.http.get<Account[]>(`${this.accountEndpoint}/${orgId}`);
   }
 
+  // Returns every organization's accounts, grouped by organization, in one call
+  getAccountsByOrganization(skipEmpty = false): Observable<AccountGroup[]> {
+    return this.http.get<AccountGroup[]>(this.accountEndpoint, {
+      params: { skipEmpty: String(skipEmpty) }
+    });
+  }
+
   // Returns details of a single account
   getAccountData(orgId: string, accountId: string): Observable<Account> {
     return this.http.get<Account>(`${this.accountEndpoint}/${orgId}/${accountId}`);
@@ -0,0 +1,21 @@
+import { Injectable } from '@angular/core';
+import { HttpClient } from '@angular/common/http';
+import { Observable, map } from 'rxjs';
+import { BatchRequest, BatchResponse } from '../models/batch.model';
+
+@Injectable({
+  providedIn: 'root'
+})
+export class BatchService {
+
+  private batchEndpoint = '/api/batch';
+
+  constructor(private http: HttpClient) {}
+
+  // Sends several API calls in one round trip; responses are keyed by request id
+  execute(requests: BatchRequest[]): Observable<Record<string, BatchResponse>> {
+    return this.http.post<{ responses: BatchResponse[] }>(this.batchEndpoint, { requests }).pipe(
+      map(({ responses }) => Object.fromEntries(responses.map(response => [response.id, response])))
+    );
+  }
+}
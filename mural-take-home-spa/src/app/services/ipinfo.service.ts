@@ -5,14 +5,13 @@ import { Observable } from 'rxjs';
 
 @Injectable({ providedIn: 'root' })
 export class IpinfoService {
-bannedCountries: string[] = ["RUS", "NK", "US"]
+  private geoEndpoint = '/api/geo';
+
   constructor(private http: HttpClient) {}
 
+  // The server resolves the caller's country and applies the sanctions list;
+  // `restricted` is the same check that blocks payout writes.
   getIpInfo(): Observable<any> {
-    return this.http.get('https://ipinfo.io/json?token=09350aad6ca0e5');
-  }
-
-  isCountryRestricted(country: string): Boolean{
-    return this.bannedCountries.includes(country)
+    return this.http.get(this.geoEndpoint);
   }
 }
@@ -1,6 +1,6 @@
 import { Injectable } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { HttpClient, HttpDownloadProgressEvent, HttpEventType } from '@angular/common/http';
+import { EMPTY, Observable, concat, defer, expand, filter, map, reduce } from 'rxjs';
 import { Payout } from '../models/payout.model';
 import { PayoutRequest } from '../models/payout-request.model';
 
@@ -13,10 +13,72 @@ export class PayoutService {
 
   constructor(private http: HttpClient) {}
 
-  // Returns a list of payouts per organization
+  // Returns every payout of an account, following the X-Next-Id cursor
+  // until the last page
   getPayoutData(org_id: string, acc_id: string, body: any): Observable<Payout[]> {
     const url = `${this.payoutEndpoint}/${org_id}/${acc_id}`;
-    return this.http.post<Payout[]>(url, body);
+    const fetchPage = (nextId: string | null) =>
+      this.http.post<Payout[]>(url, body, {
+        observe: 'response',
+        params: nextId ? { nextId } : {}
+      });
+    return fetchPage(null).pipe(
+      expand(response => {
+        const nextId = response.headers.get('X-Next-Id');
+        return nextId ? fetchPage(nextId) : EMPTY;
+      }),
+      reduce((rows, response) => rows.concat(response.body ?? []), [] as Payout[])
+    );
+  }
+
+  // Streams payouts as NDJSON, emitting every row received so far as each
+  // chunk arrives, so the table fills in before the last upstream page loads.
+  // Each page ends with a {"nextId": ...} record; the next page is requested
+  // with that cursor until it is null.
+  streamPayoutData(org_id: string, acc_id: string, body: any): Observable<Payout[]> {
+    const url = `${this.payoutEndpoint}/${org_id}/${acc_id}`;
+    return defer(() => {
+      const rows: Payout[] = [];
+      const fetchPage = (nextId: string | null): Observable<Payout[]> => {
+        let consumed = 0;
+        let cursor: string | null = null;
+        const page = this.http.post(url, body, {
+          headers: { Accept: 'application/x-ndjson' },
+          params: nextId ? { nextId } : {},
+          observe: 'events',
+          reportProgress: true,
+          responseType: 'text'
+        }).pipe(
+          filter(event => event.type === HttpEventType.DownloadProgress || event.type === HttpEventType.Response),
+          map(event => {
+            const text = event.type === HttpEventType.Response
+              ? event.body ?? ''
+              : (event as HttpDownloadProgressEvent).partialText ?? '';
+            // Only parse complete lines; a partial last line waits for the next chunk
+            const end = text.lastIndexOf('\n') + 1;
+            for (const line of text.slice(consumed, end).split('\n')) {
+              if (!line) {
+                continue;
+              }
+              const record = JSON.parse(line);
+              if (record.error) {
+                throw new Error(record.error);
+              }
+              // The trailing {"nextId": ...} record carries the paging cursor, not a payout
+              if ('nextId' in record) {
+                cursor = record.nextId;
+              } else if (record.id) {
+                rows.push(record);
+              }
+            }
+            consumed = end;
+            return [...rows];
+          })
+        );
+        return concat(page, defer(() => cursor ? fetchPage(cursor) : EMPTY));
+      };
+      return fetchPage(null);
+    });
   }
 
   executePayoutRequest(org_id: string, acc_id: string, payout_id: string): Observable<Payout> {